@@ -4,13 +4,134 @@ Searches Amazon products and generates affiliate links
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import hashlib
 import hmac
-import base64
-from urllib.parse import quote_plus, urlencode
-from datetime import datetime
-from typing import Dict, List, Optional
+import os
+import threading
+import time
+from urllib.parse import urlparse
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Union
+
+
+PAAPI_SERVICE = 'ProductAdvertisingAPI'
+PAAPI_TARGET = 'com.amazon.paapi5.v1.ProductAdvertisingAPIv1'
+GET_ITEMS_BATCH = 10  # PA-API limit on ItemIds per GetItems request
+
+# marketplace: (PA-API host, signing region)
+PAAPI_MARKETPLACES = {
+    'amazon.com': ('webservices.amazon.com', 'us-east-1'),
+    'amazon.ca': ('webservices.amazon.ca', 'us-east-1'),
+    'amazon.com.mx': ('webservices.amazon.com.mx', 'us-east-1'),
+    'amazon.com.br': ('webservices.amazon.com.br', 'us-east-1'),
+    'amazon.co.uk': ('webservices.amazon.co.uk', 'eu-west-1'),
+    'amazon.de': ('webservices.amazon.de', 'eu-west-1'),
+    'amazon.fr': ('webservices.amazon.fr', 'eu-west-1'),
+    'amazon.it': ('webservices.amazon.it', 'eu-west-1'),
+    'amazon.es': ('webservices.amazon.es', 'eu-west-1'),
+    'amazon.nl': ('webservices.amazon.nl', 'eu-west-1'),
+    'amazon.se': ('webservices.amazon.se', 'eu-west-1'),
+    'amazon.pl': ('webservices.amazon.pl', 'eu-west-1'),
+    'amazon.in': ('webservices.amazon.in', 'eu-west-1'),
+    'amazon.ae': ('webservices.amazon.ae', 'eu-west-1'),
+    'amazon.co.jp': ('webservices.amazon.co.jp', 'us-west-2'),
+    'amazon.sg': ('webservices.amazon.sg', 'us-west-2'),
+    'amazon.com.au': ('webservices.amazon.com.au', 'us-west-2'),
+}
+
+PAAPI_RESOURCES = [
+    'Images.Primary.Large',
+    'Images.Variants.Large',
+    'ItemInfo.Title',
+    'ItemInfo.Features',
+    'ItemInfo.Classifications',
+    'Offers.Listings.Price',
+    'CustomerReviews.Count',
+    'CustomerReviews.StarRating',
+    'BrowseNodeInfo.WebsiteSalesRank',
+]
+
+# Errors worth retrying (throttling and transient server errors)
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+def sign_paapi_request(operation: str, host: str, path: str, payload: str, access_key: str,
+                       secret_key: str, region: str, amz_date: str = None) -> Dict[str, str]:
+    """
+    Headers for a PA-API 5.0 request signed with AWS Signature Version 4
+    amz_date (YYYYMMDDTHHMMSSZ) defaults to now; pass the received one to verify a signature
+    """
+    amz_date = amz_date or datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    headers = {
+        'content-encoding': 'amz-1.0',
+        'content-type': 'application/json; charset=utf-8',
+        'host': host,
+        'x-amz-date': amz_date,
+        'x-amz-target': f"{PAAPI_TARGET}.{operation}",
+    }
+    signed_headers = ';'.join(sorted(headers))
+    canonical_request = '\n'.join([
+        'POST', path, '',
+        ''.join(f"{name}:{headers[name]}\n" for name in sorted(headers)),
+        signed_headers,
+        hashlib.sha256(payload.encode('utf-8')).hexdigest(),
+    ])
+    
+    scope = f"{amz_date[:8]}/{region}/{PAAPI_SERVICE}/aws4_request"
+    string_to_sign = '\n'.join([
+        'AWS4-HMAC-SHA256', amz_date, scope,
+        hashlib.sha256(canonical_request.encode('utf-8')).hexdigest(),
+    ])
+    
+    key = f"AWS4{secret_key}".encode('utf-8')
+    for part in (amz_date[:8], region, PAAPI_SERVICE, 'aws4_request'):
+        key = hmac.new(key, part.encode('utf-8'), hashlib.sha256).digest()
+    signature = hmac.new(key, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+    
+    headers['Authorization'] = (f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+                                f"SignedHeaders={signed_headers}, Signature={signature}")
+    return headers
+
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_paapi_session() -> requests.Session:
+    """Shared keep-alive session for PA-API calls (one TLS handshake per connection, not per request)"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+
+# Request spacing is per process, not per AmazonProductSearch: search_amazon_product
+# builds a new searcher per call, and back-to-back calls share the account's rate limit
+_last_request = 0.0
+_throttle_lock = threading.Lock()
+
+def _throttle(interval: float):
+    """Wait until `interval` seconds have passed since the previous PA-API request"""
+    global _last_request
+    with _throttle_lock:
+        wait = _last_request + interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        _last_request = time.monotonic()
+
+
+class PAAPIError(Exception):
+    """Error response from the Product Advertising API"""
+    
+    def __init__(self, code: str, message: str, status: int = None):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.status = status
 
 
 class AmazonProductSearch:
@@ -19,17 +140,33 @@ class AmazonProductSearch:
         self.secret_key = config.get('amazon', {}).get('secret_key')
         self.associate_tag = config.get('amazon', {}).get('associate_tag')
         self.marketplace = config.get('amazon', {}).get('marketplace', 'amazon.com')
-        
+        host, region = PAAPI_MARKETPLACES.get(self.marketplace, PAAPI_MARKETPLACES['amazon.com'])
+        # endpoint overrides scheme/host, e.g. http://127.0.0.1:8766 for the paapi_replay server
+        self.endpoint = config.get('amazon', {}).get('endpoint') or f"https://{host}"
+        self.region = config.get('amazon', {}).get('region', region)
+        self.timeout = config.get('amazon', {}).get('timeout', 10)
+        self.max_retries = config.get('amazon', {}).get('max_retries', 3)
+        # PA-API allows 1 request/second for new accounts (more with sales volume)
+        self.request_interval = config.get('amazon', {}).get('request_interval', 1.0)
+        self.record_path = config.get('amazon', {}).get('record_responses')
+        self.session = get_paapi_session()
+        self.request_count = 0
+        # Without real credentials (e.g. the config.json placeholders) mock data is returned
+        self.use_api = all(value and not str(value).startswith('YOUR_')
+                           for value in (self.access_key, self.secret_key, self.associate_tag))
+    
     def search_product(self, query: str, item_page: int = 1) -> Optional[Dict]:
         """
         Search for products on Amazon using Product Advertising API
         Returns product details including images, price, and affiliate link
         """
         try:
-            # For demo purposes, we'll create a mock product
-            # In production, replace this with actual Amazon PA-API calls
-            
-            product = self._mock_product_search(query)
+            if self.use_api:
+                # First result that has an image (pins need one)
+                products = self.search_items(query, item_page)
+                product = next((p for p in products if p['images']), None)
+            else:
+                product = self._mock_product_search(query)
             
             if product:
                 # Add affiliate link
@@ -42,29 +179,155 @@ class AmazonProductSearch:
             print(f"Error searching Amazon: {e}")
             return None
     
+    def search_items(self, keywords: str, item_page: int = 1, search_index: str = 'All') -> List[Dict]:
+        """SearchItems: up to 10 products for the keywords (empty list when nothing matches)"""
+        try:
+            data = self._call('SearchItems', {
+                'Keywords': keywords,
+                'ItemPage': item_page,
+                'SearchIndex': search_index,
+                'Resources': PAAPI_RESOURCES,
+            })
+        except PAAPIError as e:
+            if e.code == 'NoResults':
+                return []
+            raise
+        
+        self._record('SearchItems', f"{keywords.strip().lower()}|{item_page}", data)
+        return [self._parse_item(item) for item in data.get('SearchResult', {}).get('Items', [])]
+    
+    def get_items(self, asins: List[str]) -> Dict[str, Dict]:
+        """
+        GetItems for any number of ASINs, GET_ITEMS_BATCH per request
+        Returns {asin: product}; ASINs Amazon could not return are left out
+        """
+        asins = list(dict.fromkeys(asin for asin in asins if asin))
+        products = {}
+        for start in range(0, len(asins), GET_ITEMS_BATCH):
+            batch = asins[start:start + GET_ITEMS_BATCH]
+            try:
+                data = self._call('GetItems', {
+                    'ItemIds': batch,
+                    'ItemIdType': 'ASIN',
+                    'Resources': PAAPI_RESOURCES,
+                })
+            except PAAPIError as e:
+                if e.code != 'ItemNotAccessible':
+                    raise
+                # None of this batch is available; keep the other batches
+                print(f"⚠️  GetItems: {e}")
+                continue
+            for error in data.get('Errors', []):
+                # Partial success: e.g. ItemNotAccessible for some of the ASINs
+                print(f"⚠️  GetItems: {error.get('Code')}: {error.get('Message')}")
+            for item in data.get('ItemsResult', {}).get('Items', []):
+                self._record('GetItems', item.get('ASIN'), item)
+                product = self._parse_item(item)
+                product['affiliate_link'] = self._generate_affiliate_link(product['asin'])
+                products[product['asin']] = product
+        return products
+    
+    def _call(self, operation: str, params: Dict) -> Dict:
+        """Signed POST to the PA-API operation, retrying throttled and 5xx responses with backoff"""
+        payload = json.dumps(dict(params, PartnerTag=self.associate_tag, PartnerType='Associates',
+                                  Marketplace=f"www.{self.marketplace}"))
+        url = urlparse(self.endpoint)
+        path = f"/paapi5/{operation.lower()}"
+        
+        for attempt in range(self.max_retries + 1):
+            _throttle(self.request_interval)
+            headers = sign_paapi_request(operation, url.netloc, path, payload,
+                                         self.access_key, self.secret_key, self.region)
+            self.request_count += 1
+            response = self.session.post(f"{url.scheme}://{url.netloc}{path}", data=payload.encode('utf-8'),
+                                         headers=headers, timeout=self.timeout)
+            if response.status_code in RETRY_STATUS and attempt < self.max_retries:
+                time.sleep(self.request_interval * 2 ** attempt)
+                continue
+            break
+        
+        try:
+            data = response.json()
+        except ValueError:
+            data = {}
+        if response.status_code != 200:
+            error = (data.get('Errors') or [{}])[0]
+            raise PAAPIError(error.get('Code', f"HTTP{response.status_code}"),
+                             error.get('Message', response.reason), response.status_code)
+        return data
+    
+    def _parse_item(self, item: Dict) -> Dict:
+        """PA-API Item -> product dict (same keys as the rest of the pipeline uses)"""
+        images = item.get('Images', {})
+        image_urls = [images.get('Primary', {}).get('Large', {}).get('URL')]
+        image_urls += [variant.get('Large', {}).get('URL') for variant in images.get('Variants', [])]
+        
+        info = item.get('ItemInfo', {})
+        listings = item.get('Offers', {}).get('Listings', [])
+        price = listings[0].get('Price', {}).get('Amount') if listings else None
+        reviews = item.get('CustomerReviews', {})
+        sales_rank = item.get('BrowseNodeInfo', {}).get('WebsiteSalesRank', {}).get('SalesRank')
+        
+        return {
+            'asin': item.get('ASIN'),
+            'title': info.get('Title', {}).get('DisplayValue', ''),
+            'price': price or 0,
+            'rating': reviews.get('StarRating', {}).get('Value'),
+            'reviews': reviews.get('Count', 0),
+            'images': [url for url in image_urls if url],
+            'description': ' '.join(info.get('Features', {}).get('DisplayValues', [])[:3]),
+            'category': info.get('Classifications', {}).get('ProductGroup', {}).get('DisplayValue', 'General'),
+            'best_seller': sales_rank is not None and sales_rank <= 100,
+            'sales_rank': sales_rank,
+            'detail_page_url': item.get('DetailPageURL'),
+        }
+    
+    def _record(self, operation: str, key: str, response: Dict):
+        """Save a response for offline replay (amazon.record_responses); see paapi_replay.py"""
+        if not self.record_path or not key:
+            return
+        try:
+            with open(self.record_path, 'r') as f:
+                recordings = json.load(f)
+        except (OSError, ValueError):
+            recordings = {}
+        recordings.setdefault(operation, {})[key] = response
+        tmp_path = f"{self.record_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(recordings, f, indent=2)
+        os.replace(tmp_path, self.record_path)
+    
     def _generate_affiliate_link(self, asin: str) -> str:
         """Generate Amazon affiliate link"""
         if not asin:
             return ""
         
-        base_url = f"https://www.amazon.com/dp/{asin}"
+        base_url = f"https://www.{self.marketplace}/dp/{asin}"
         affiliate_link = f"{base_url}/?tag={self.associate_tag}"
         return affiliate_link
     
-    def get_product_details(self, asin: str) -> Optional[Dict]:
-        """Get detailed product information from ASIN"""
+    def get_product_details(self, asin: Union[str, List[str]]) -> Union[Optional[Dict], Dict[str, Dict]]:
+        """
+        Get detailed product information from ASIN
+        Given a list of ASINs, returns {asin: product} fetched with one
+        GetItems request per 10 ASINs (catalog refreshes)
+        """
         try:
-            # Mock product details - replace with actual PA-API call in production
-            product = self._mock_product_details(asin)
+            if not self.use_api:
+                if isinstance(asin, str):
+                    products = {asin: self._mock_product_details(asin)}
+                else:
+                    products = {a: self._mock_product_details(a) for a in asin}
+                for a, product in products.items():
+                    product['affiliate_link'] = self._generate_affiliate_link(a)
+            else:
+                products = self.get_items([asin] if isinstance(asin, str) else asin)
             
-            if product:
-                product['affiliate_link'] = self._generate_affiliate_link(asin)
-            
-            return product
+            return products.get(asin) if isinstance(asin, str) else products
             
         except Exception as e:
             print(f"Error getting product details: {e}")
-            return None
+            return None if isinstance(asin, str) else {}
     
     def find_alternative_product(self, original_query: str, ranking: int = 1) -> Optional[Dict]:
         """
@@ -150,7 +413,7 @@ class AmazonProductSearch:
     
     def _mock_product_details(self, asin: str) -> Optional[Dict]:
         """Mock product details"""
-        return self._mock_product_search('product')
+        return dict(self._mock_product_search('product'))
 
 
 def search_amazon_product(query: str, config: dict, fallback_rank: int = 0) -> Optional[Dict]:
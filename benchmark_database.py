@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Database Benchmark
+Compares the posted_at index against the original full-scan window queries
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from database import ProductDatabase
+
+
+def generate_products(rows: int, history_days: int = 730) -> List[Dict]:
+    """Generate synthetic posted products spread over the last N days"""
+    now = datetime.now()
+    products = []
+    for i in range(rows):
+        posted_at = now - timedelta(seconds=random.randint(0, history_days * 86400))
+        products.append({
+            'asin': f'B{i:09d}',
+            'title': f'Synthetic Product {i}',
+            'price': 19.99,
+            'pinterest_keyword': 'benchmark',
+            'posted_at': posted_at.isoformat(),
+            'pin_created': i % 10 != 0
+        })
+    return products
+
+
+def full_scan_recently_posted(products: List[Dict], days: int) -> List[str]:
+    """Original implementation: parse every row on every call"""
+    cutoff_date = datetime.now() - timedelta(days=days)
+    recent = []
+    for product in products:
+        posted_at = product.get('posted_at')
+        if posted_at:
+            try:
+                if datetime.fromisoformat(posted_at) >= cutoff_date:
+                    recent.append(product.get('asin'))
+            except ValueError:
+                pass
+    return recent
+
+
+def timed(func, repeat: int) -> float:
+    """Average wall time of func in milliseconds"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def run_benchmark(rows: int = 1_000_000, repeat: int = 5):
+    """Benchmark window queries over synthetic history"""
+    print(f"Generating {rows:,} synthetic rows...")
+    products = generate_products(rows)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ProductDatabase(os.path.join(tmp, 'bench.json'))
+        db.data = {'products': products}
+
+        start = time.perf_counter()
+        db._rebuild_index()
+        build_ms = (time.perf_counter() - start) * 1000
+        print(f"Index build (once at startup): {build_ms:.0f} ms")
+
+        for days in (7, 30):
+            scan_ms = timed(lambda: full_scan_recently_posted(products, days), max(1, repeat // 5))
+            index_ms = timed(lambda: db.get_recently_posted(days), repeat)
+            count_ms = timed(lambda: db._count_posted_since(days), repeat)
+            print(f"last {days:>2} days: full scan {scan_ms:9.1f} ms | "
+                  f"bisect+slice {index_ms:7.2f} ms | count {count_ms:.4f} ms | "
+                  f"speedup {scan_ms / index_ms:,.0f}x")
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    run_benchmark(rows)
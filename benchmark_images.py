@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Image Pipeline Benchmark
+Micro benchmarks of ImageProcessor resize strategies, and a throughput
+harness for the whole pipeline with JSON results for regression tracking
+
+    python benchmark_images.py                        # micro benchmarks
+    python benchmark_images.py --pipeline -o run.json # pipeline harness
+    python benchmark_images.py --pipeline --compare baseline.json
+"""
+
+import argparse
+import functools
+import io
+import json
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+import PIL
+from PIL import Image, ImageDraw
+
+from image_processor import PIN_FORMATS, ImageProcessor, content_bbox, content_bbox_pil, np
+from workspace import Workspace
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, peak RSS is not reported
+    resource = None
+
+
+SOURCE_SIZES = [(500, 500), (800, 1200), (1500, 1500), (1500, 1125), (2000, 3000)]
+
+# Pipeline corpus: small/large, square/portrait/landscape
+CORPUS_SIZES = [(300, 450), (500, 500), (800, 1200), (1000, 1500), (1200, 800),
+                (1500, 1500), (2000, 3000), (3000, 2000), (4000, 4000)]
+PIPELINE_STAGES = ('download_image', 'upscale_with_pil', 'optimize_for_pinterest', 'process_product_images')
+
+
+def make_product_image(size: Tuple[int, int]) -> Image.Image:
+    """Synthetic product shot: white background with a shaded product in the middle"""
+    width, height = size
+    img = Image.new('RGB', size, (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    for i in range(0, min(width, height) // 3, 4):
+        shade = 40 + (i * 3) % 180
+        draw.ellipse([width // 4 + i // 2, height // 4 + i // 2,
+                      3 * width // 4 - i // 2, 3 * height // 4 - i // 2],
+                     outline=(shade, 90, 255 - shade), width=4)
+    return img
+
+
+def cpu_ms(func: Callable, repeat: int = 3) -> float:
+    """Average process CPU time of func in milliseconds"""
+    start = time.process_time()
+    for _ in range(repeat):
+        func()
+    return (time.process_time() - start) * 1000 / repeat
+
+
+def wall_ms(func: Callable, repeat: int = 3) -> float:
+    """Average wall time of func in milliseconds (includes work done in threads)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def benchmark_resample_planning(processor: ImageProcessor, sizes: List[Tuple[int, int]] = SOURCE_SIZES) -> List[Dict]:
+    """Compare PIL 2x upscale + fit (old path) with the single planned resample"""
+    results = []
+    for size in sizes:
+        img = make_product_image(size)
+        img.load()
+
+        def upscale_then_fit():
+            processor.fit_to_canvas(processor.upscale_pil_image(img, 2))
+
+        def planned():
+            processor.fit_to_canvas(img)
+
+        old_ms = cpu_ms(upscale_then_fit)
+        new_ms = cpu_ms(planned)
+        results.append({
+            'source': f"{size[0]}x{size[1]}",
+            'resample_to': "{}x{}".format(*processor.plan_resample(size)),
+            'upscale_then_fit_ms': round(old_ms, 1),
+            'planned_ms': round(new_ms, 1),
+            'saved_ms': round(old_ms - new_ms, 1)
+        })
+    return results
+
+
+def benchmark_jpeg_draft(sizes: List[Tuple[int, int]] = ((1500, 1500), (3000, 3000), (4000, 6000))) -> List[Dict]:
+    """Compare full-resolution JPEG decode + fit with draft-mode decode + fit"""
+    results = []
+    for size in sizes:
+        buffer = io.BytesIO()
+        make_product_image(size).save(buffer, 'JPEG', quality=90)
+        data = buffer.getvalue()
+
+        timings = {}
+        for draft in (False, True):
+            processor = ImageProcessor({'image_processing': {
+                'upscale_using': 'none', 'cache_enabled': False, 'jpeg_draft': draft,
+                'reducing_gap': 3.0 if draft else None
+            }})
+            timings[draft] = cpu_ms(lambda: processor.fit_to_canvas(processor.open_image(io.BytesIO(data))).load())
+
+        results.append({
+            'source': f"{size[0]}x{size[1]}",
+            'full_decode_ms': round(timings[False], 1),
+            'draft_ms': round(timings[True], 1),
+            'saved_ms': round(timings[False] - timings[True], 1)
+        })
+    return results
+
+
+def benchmark_variants(sizes: List[Tuple[int, int]] = ((800, 800), (1500, 1500), (2000, 2000), (3000, 2000))) -> List[Dict]:
+    """Compare one optimize_for_pinterest run per format with render_variants (wall ms per product)"""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'source.jpg')
+        for size in sizes:
+            make_product_image(size).save(source, 'JPEG', quality=90)
+            
+            per_format = [ImageProcessor({'image_processing': {
+                'upscale_using': 'none', 'cache_enabled': False, 'target_width': w, 'target_height': h
+            }}) for w, h in PIN_FORMATS.values()]
+            processor = ImageProcessor({'image_processing': {'upscale_using': 'none', 'cache_enabled': False}})
+            
+            def separate():
+                for p in per_format:
+                    p.optimize_for_pinterest(source)
+            
+            separate_ms = wall_ms(separate)
+            single_ms = wall_ms(lambda: processor.render_variants(source))
+            results.append({
+                'source': f"{size[0]}x{size[1]}",
+                'separate_ms': round(separate_ms, 1),
+                'render_variants_ms': round(single_ms, 1),
+                'saved_ms': round(separate_ms - single_ms, 1)
+            })
+    return results
+
+
+def benchmark_trim(sizes: List[Tuple[int, int]] = ((1500, 1500), (3000, 3000), (6000, 4000))) -> List[Dict]:
+    """Compare NumPy content_bbox with the pure-PIL version on decoded images (wall ms)"""
+    results = []
+    for size in sizes:
+        width, height = size
+        img = Image.new('RGB', size, (255, 255, 255))
+        img.paste(make_product_image((width // 2, height // 2)), (width // 5, height // 3))
+        img.load()
+        
+        numpy_ms = wall_ms(lambda: content_bbox(img), repeat=5)
+        pil_ms = wall_ms(lambda: content_bbox_pil(img), repeat=2)
+        results.append({
+            'source': f"{width}x{height}",
+            'bbox': content_bbox(img),
+            'pil_ms': round(pil_ms, 1),
+            'numpy_ms': round(numpy_ms, 1),
+            'speedup': round(pil_ms / numpy_ms, 1)
+        })
+    return results
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def local_image_server(directory: str):
+    """Serve a directory over HTTP on a free localhost port; yields the base URL"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(_QuietHandler, directory=directory))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def build_corpus(directory: str, sizes: List[Tuple[int, int]] = CORPUS_SIZES, copies: int = 2,
+                 fixtures_dir: str = None) -> List[str]:
+    """
+    Write synthetic product JPEGs (plus any recorded fixture images) into directory
+    Returns the file names
+    """
+    names = []
+    for copy in range(copies):
+        for width, height in sizes:
+            name = f"synthetic_{width}x{height}_{copy}.jpg"
+            make_product_image((width, height)).save(os.path.join(directory, name), 'JPEG', quality=88 - copy * 8)
+            names.append(name)
+
+    if fixtures_dir:
+        for i, entry in enumerate(sorted(os.listdir(fixtures_dir))):
+            if entry.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
+                # .jpg name: the pipeline derives output names from it; PIL sniffs the real format
+                name = f"fixture_{i}.jpg"
+                shutil.copyfile(os.path.join(fixtures_dir, entry), os.path.join(directory, name))
+                names.append(name)
+    return names
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _run_stage(stage: str, corpus_dir: str, base_url: str, names: List[str], config: dict) -> Dict:
+    """Run one pipeline stage over the corpus (in a fresh worker process) and collect stats"""
+    rss_start = _peak_rss_mb()
+    work_dir = tempfile.mkdtemp(prefix=f"bench_{stage}_")
+    processor = ImageProcessor(config, workspace=Workspace(work_dir))
+
+    def run_one(i: int, name: str) -> int:
+        source = os.path.join(corpus_dir, name)
+        if stage == 'download_image':
+            data = processor.download_image(base_url + name)
+            return len(data) if data else 0
+        if stage == 'upscale_with_pil':
+            output = processor._upscale_with_pil(source, 2)
+        elif stage == 'optimize_for_pinterest':
+            output = processor.optimize_for_pinterest(source)
+        else:
+            output = processor.process_product_images([base_url + name], f"bench {i}")
+        if not output:
+            return 0
+        size = os.path.getsize(output)
+        if output != source:
+            os.remove(output)
+        return size
+
+    try:
+        run_one(0, names[0])  # warm-up: imports, connection pool, caches of PIL
+        latencies = []
+        output_bytes = 0
+        failures = 0
+        start = time.perf_counter()
+        for i, name in enumerate(names):
+            t0 = time.perf_counter()
+            produced = run_one(i, name)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            output_bytes += produced
+            failures += produced == 0
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'images': len(names),
+        'failures': failures,
+        'images_per_second': round(len(names) / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 50), 1),
+        'p95_ms': round(percentile(latencies, 95), 1),
+        'output_bytes': output_bytes,
+        'rss_start_mb': rss_start,
+        'peak_rss_mb': _peak_rss_mb()
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_pipeline_benchmark(copies: int = 2, fixtures_dir: str = None, config: dict = None,
+                           stages: Tuple[str, ...] = PIPELINE_STAGES) -> Dict:
+    """
+    Throughput of the main ImageProcessor stages over a generated corpus
+
+    Images are served by a local HTTP server so downloads are measured
+    without the network. Each stage runs in its own worker process, so
+    peak_rss_mb is that stage's high-water mark (rss_start_mb is what the
+    worker inherited). Caching and dedupe are off unless config enables them.
+    """
+    settings = {'upscale_using': 'pil', 'cache_enabled': False, 'dedupe_images': False, 'batch_workers': 1}
+    settings.update((config or {}).get('image_processing', {}))
+    config = {'image_processing': settings}
+
+    results = {
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'pillow': PIL.__version__,
+        'numpy': np.__version__ if np is not None else None,
+        'cpu_count': os.cpu_count(),
+        'config': settings,
+        'stages': {}
+    }
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        names = build_corpus(corpus_dir, copies=copies, fixtures_dir=fixtures_dir)
+        results['corpus'] = {'images': len(names), 'bytes': sum(
+            os.path.getsize(os.path.join(corpus_dir, name)) for name in names)}
+
+        with local_image_server(corpus_dir) as base_url:
+            for stage in stages:
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    results['stages'][stage] = executor.submit(
+                        _run_stage, stage, corpus_dir, base_url, names, config).result()
+
+    return results
+
+
+def compare_results(current: Dict, baseline: Dict, tolerance: float = 0.10) -> List[str]:
+    """Stages whose throughput dropped or p95 latency grew by more than tolerance"""
+    regressions = []
+    for stage, now in current['stages'].items():
+        before = baseline.get('stages', {}).get(stage)
+        if not before:
+            continue
+        if now['images_per_second'] < before['images_per_second'] * (1 - tolerance):
+            regressions.append(f"{stage}: {before['images_per_second']} -> {now['images_per_second']} images/s")
+        if now['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{stage}: p95 {before['p95_ms']} -> {now['p95_ms']} ms")
+    return regressions
+
+
+def print_pipeline_results(results: Dict):
+    corpus = results['corpus']
+    print(f"Pipeline benchmark: {corpus['images']} images ({corpus['bytes'] / 1024 / 1024:.1f} MB), "
+          f"{results['cpu_count']} CPUs, commit {results['git_commit']}")
+    print(f"{'stage':>24} {'img/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'peak MB':>8} {'out MB':>8}")
+    for stage, row in results['stages'].items():
+        print(f"{stage:>24} {row['images_per_second']:>8} {row['p50_ms']:>8} {row['p95_ms']:>8} "
+              f"{row['peak_rss_mb']:>8} {row['output_bytes'] / 1024 / 1024:>8.1f}")
+
+
+def pipeline_main(args) -> int:
+    config = None
+    if args.config:
+        with open(args.config, 'r') as f:
+            config = json.load(f)
+
+    results = run_pipeline_benchmark(copies=args.copies, fixtures_dir=args.fixtures, config=config)
+    print_pipeline_results(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get('corpus') != results['corpus']:
+            print("\n⚠️  Baseline was measured on a different corpus; numbers are not comparable")
+        regressions = compare_results(results, baseline, args.tolerance)
+        if regressions:
+            print("\n❌ Regressions against baseline:")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print("\n✅ No regressions against baseline")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ImageProcessor benchmarks")
+    parser.add_argument('--pipeline', action='store_true', help="run the pipeline throughput harness")
+    parser.add_argument('-o', '--output', help="write pipeline results to this JSON file")
+    parser.add_argument('--compare', help="baseline JSON to check for regressions (exit 1 if any)")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="allowed slowdown (default 0.10)")
+    parser.add_argument('--copies', type=int, default=2, help="synthetic images per corpus size")
+    parser.add_argument('--fixtures', help="directory of recorded product images to add to the corpus")
+    parser.add_argument('--config', help="config.json whose image_processing section to benchmark")
+    args = parser.parse_args()
+
+    if args.pipeline:
+        sys.exit(pipeline_main(args))
+    micro_benchmarks()
+
+
+def micro_benchmarks():
+    processor = ImageProcessor({'image_processing': {'upscale_using': 'pil', 'cache_enabled': False}})
+
+    print("Resample planning (CPU ms per image)")
+    print(f"{'source':>10} {'resample to':>12} {'2x+fit':>9} {'planned':>9} {'saved':>9}")
+    for row in benchmark_resample_planning(processor):
+        print(f"{row['source']:>10} {row['resample_to']:>12} {row['upscale_then_fit_ms']:>9} "
+              f"{row['planned_ms']:>9} {row['saved_ms']:>9}")
+
+    print("\nJPEG draft decoding (CPU ms per image, decode + fit)")
+    print(f"{'source':>10} {'full':>9} {'draft':>9} {'saved':>9}")
+    for row in benchmark_jpeg_draft():
+        print(f"{row['source']:>10} {row['full_decode_ms']:>9} {row['draft_ms']:>9} {row['saved_ms']:>9}")
+    
+    print(f"\nPin formats {', '.join(PIN_FORMATS)} (wall ms per product, {os.cpu_count()} CPUs)")
+    print(f"{'source':>10} {'separate':>9} {'variants':>9} {'saved':>9}")
+    for row in benchmark_variants():
+        print(f"{row['source']:>10} {row['separate_ms']:>9} {row['render_variants_ms']:>9} {row['saved_ms']:>9}")
+    
+    print("\nWhitespace bounding box (wall ms per image)")
+    print(f"{'source':>10} {'PIL':>9} {'NumPy':>9} {'speedup':>9}")
+    for row in benchmark_trim():
+        print(f"{row['source']:>10} {row['pil_ms']:>9} {row['numpy_ms']:>9} {row['speedup']:>8}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Persistent Bloom Filter
+Compact on-disk membership index, loaded with mmap instead of parsed
+"""
+
+import hashlib
+import math
+import mmap
+import os
+import struct
+from typing import Iterable
+
+
+class BloomFilter:
+    """
+    Bloom filter stored in a single file: a small header followed by the bit array
+
+    Opening maps the file into memory, so startup cost does not depend on how
+    many items were added. Lookups can return false positives (never false
+    negatives), so callers confirm hits with an exact check.
+    """
+
+    MAGIC = b'PINBLOOM'
+    HEADER = struct.Struct('<8sQQQQ')  # magic, num_bits, num_hashes, capacity, count
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'r+b')
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+
+        magic, self.num_bits, self.num_hashes, self.capacity, _ = self.HEADER.unpack_from(self._mmap, 0)
+        if magic != self.MAGIC:
+            self.close()
+            raise ValueError(f"Not a bloom filter file: {path}")
+
+    @classmethod
+    def create(cls, path: str, capacity: int = 1_000_000, error_rate: float = 0.001,
+               items: Iterable[str] = ()) -> 'BloomFilter':
+        """Create a new filter file sized for capacity items at the given false positive rate"""
+        capacity = max(capacity, 1)
+        num_bits = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        num_bits = max(8, (num_bits + 7) // 8 * 8)
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, num_bits, num_hashes, capacity, 0))
+            f.truncate(cls.HEADER.size + num_bits // 8)
+
+        bloom = cls(tmp_path)
+        for item in items:
+            bloom.add(item)
+        bloom.flush()
+        bloom.close()
+
+        os.replace(tmp_path, path)
+        return cls(path)
+
+    @property
+    def count(self) -> int:
+        """Number of add() calls recorded in the file"""
+        return self.HEADER.unpack_from(self._mmap, 0)[4]
+
+    def _positions(self, item: str):
+        """Bit positions for item (double hashing over one blake2b digest)"""
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1, h2 = struct.unpack('<QQ', digest)
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str):
+        """Add an item"""
+        offset = self.HEADER.size
+        for position in self._positions(item):
+            byte_index = offset + (position >> 3)
+            self._mmap[byte_index] = self._mmap[byte_index] | (1 << (position & 7))
+
+        self.HEADER.pack_into(self._mmap, 0, self.MAGIC, self.num_bits, self.num_hashes,
+                              self.capacity, self.count + 1)
+
+    def __contains__(self, item: str) -> bool:
+        offset = self.HEADER.size
+        return all(self._mmap[offset + (position >> 3)] & (1 << (position & 7))
+                   for position in self._positions(item))
+
+    def flush(self):
+        """Write dirty pages back to the file"""
+        self._mmap.flush()
+
+    def close(self):
+        """Unmap and close the file"""
+        if not self._mmap.closed:
+            self._mmap.close()
+        self._file.close()
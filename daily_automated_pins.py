@@ -143,6 +143,16 @@ def create_affiliate_link(asin, associate_tag):
     return f"https://www.amazon.com/dp/{asin}?tag={associate_tag}"
 
 
+def to_db_product(product, config):
+    """Map a catalog product to the fields stored in the posted products database"""
+    return {
+        'asin': product['amazon_asin'],
+        'title': product['title'],
+        'price': product.get('price'),
+        'affiliate_link': create_affiliate_link(product['amazon_asin'], config['associate_tag'])
+    }
+
+
 def create_pin_description(product):
     """Create pin description with all details"""
     return f"{product['description']}\n\n💰 Price: {product['price']}\n⭐ Rating: {product['rating']}/5\n\n🛒 Click to buy on Amazon!\n\n{product['hashtags']} #AmazonFinds #BestProducts #MustHave #ShoppingDeals"
@@ -212,11 +222,23 @@ def run_daily_pin_batch():
     
     board_name = config.get('board_name', 'MCP Test Board')
     
+    results = []
     for i, product in enumerate(daily_products, 1):
         print(f"\n[{i}/{len(daily_products)}] Posting pin...")
-        post_single_pin(product, config, board_name)
+        success = post_single_pin(product, config, board_name)
+        # Catalog entries carry no research keyword: record their hashtags (the
+        # terms the pin targets), or the product title for entries without any
+        keyword = product.get('hashtags') or product['title']
+        results.append((to_db_product(product, config), {'keyword': keyword}, success))
         time.sleep(2)  # Small delay between posts
     
+    # Record the whole run with a single write
+    try:
+        from database import save_products
+        save_products(results)
+    except Exception as e:
+        print(f"⚠️ Could not record posted pins: {e}")
+    
     print(f"\n{'='*60}")
     print(f"✅ Daily automation complete!")
     print(f"{'='*60}\n")
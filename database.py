@@ -3,91 +3,961 @@ Database Module for Tracking Posted Products
 Stores product details to avoid duplicates
 """
 
+import bisect
+import gzip
 import json
 import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import List, Dict, Optional, Set, Tuple
+
+from bloom_filter import BloomFilter
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process file locking
+    fcntl = None
+
+
+DEFAULT_DB_PATH = os.environ.get('PRODUCT_DB_PATH', 'posted_products.json')
+DB_JOURNAL_MODE = os.environ.get('PRODUCT_DB_JOURNAL', '').lower() in ('1', 'true', 'yes')
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+BLOOM_MIN_CAPACITY = 100_000
+
+
+def _parse_timestamp(posted_at) -> Optional[float]:
+    """Parse an ISO posted_at value into an epoch timestamp (None if invalid)"""
+    if not posted_at:
+        return None
+    try:
+        return datetime.fromisoformat(str(posted_at)).timestamp()
+    except ValueError:
+        return None
+
+def _cutoff_timestamp(days: int) -> float:
+    """Epoch timestamp N days ago"""
+    return (datetime.now() - timedelta(days=days)).timestamp()
+
+def _entry_day(entry: Dict) -> Optional[str]:
+    """Day bucket key (YYYY-MM-DD) of an entry's posted_at"""
+    posted_at = entry.get('posted_at')
+    if not posted_at:
+        return None
+    return str(posted_at)[:10]
+
+def build_entry(product: Dict, pinterest_data: Dict, pin_created: bool) -> Dict:
+    """Build the stored record for a posted product"""
+    return {
+        'asin': product.get('asin'),
+        'title': product.get('title'),
+        'price': product.get('price'),
+        'affiliate_link': product.get('affiliate_link'),
+        'pinterest_keyword': pinterest_data.get('keyword'),
+        'posted_at': datetime.now().isoformat(),
+        'pin_created': pin_created
+    }
+
+
+class StatsCounters:
+    """
+    Incrementally maintained stats: totals plus per-day buckets
+
+    Window counts sum the whole-day buckets inside the window and ask the
+    storage backend only for the partial boundary day, so they cost O(days)
+    instead of O(rows).
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.successful = 0
+        self.daily = {}
+        self.snapshot = None
+
+    def add(self, entry: Dict):
+        """Count a saved entry"""
+        self.total += 1
+        if entry.get('pin_created', False):
+            self.successful += 1
+
+        day = _entry_day(entry)
+        if day:
+            self.daily[day] = self.daily.get(day, 0) + 1
+
+        if self.snapshot is not None:
+            # Keep the cached snapshot current; a new post is inside every window
+            self.snapshot = self._snapshot(self.snapshot['last_7_days'] + 1,
+                                           self.snapshot['last_30_days'] + 1)
+
+    def count_since(self, days: int, count_between) -> int:
+        """
+        Count entries posted in last N days
+        count_between(start_ts, end_ts) counts entries in the boundary day
+        """
+        cutoff = datetime.now() - timedelta(days=days)
+        next_day = datetime.combine(cutoff.date() + timedelta(days=1), datetime.min.time())
+
+        whole_days = 0
+        day = next_day.date()
+        today = datetime.now().date()
+        while day <= today:
+            whole_days += self.daily.get(day.isoformat(), 0)
+            day += timedelta(days=1)
+
+        return whole_days + count_between(cutoff.timestamp(), next_day.timestamp())
+
+    def refresh(self, count_between) -> Dict:
+        """Recompute window counts and cache the stats snapshot"""
+        self.snapshot = self._snapshot(self.count_since(7, count_between),
+                                       self.count_since(30, count_between))
+        return dict(self.snapshot)
+
+    def _snapshot(self, last_7_days: int, last_30_days: int) -> Dict:
+        return {
+            'total': self.total,
+            'successful': self.successful,
+            'failed': self.total - self.successful,
+            'last_7_days': last_7_days,
+            'last_30_days': last_30_days
+        }
 
 
 class ProductDatabase:
-    def __init__(self, db_path: str = 'posted_products.json'):
+    """
+    JSON file storage for posted products
+
+    With journal=True every save appends one JSON line to `<db_path>.journal`
+    instead of rewriting the whole file. The journal is replayed on startup and
+    folded into the snapshot in the background once it grows past
+    compact_threshold bytes.
+
+    Several processes (cron runs, the scheduler loop) can share one store:
+    writes hold an fcntl lock on `<db_path>.lock`, and reads reload only when
+    the snapshot or journal changed on disk.
+
+    `<db_path>.bloom` is an mmap-loaded Bloom filter over every ASIN ever
+    posted, used by has_ever_posted() for all-time repost checks.
+
+    Months older than archive_after_days move to gzip partitions in
+    `<name>_archive/YYYY-MM.json.gz`, so startup only parses recent history.
+    Archived months are read only by explicit historical queries (and by
+    get_recently_posted windows reaching past the cutoff); their per-month
+    counts and ASINs live in the archive manifest, so stats and
+    has_ever_posted never decompress them.
+    """
+
+    def __init__(self, db_path: str = 'posted_products.json', journal: bool = False,
+                 compact_threshold: int = 1024 * 1024, archive_after_days: int = 31):
         self.db_path = db_path
+        self.journal = journal
+        self.journal_path = f"{db_path}.journal"
+        self.lock_path = f"{db_path}.lock"
+        self.compact_threshold = compact_threshold
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._compactor = None
+        self._batch = None
+        self._disk_signature = None
+        self._journal_offset = 0
+        self.bloom_path = f"{db_path}.bloom"
+        self._bloom = None
+        self.archive_dir = f"{os.path.splitext(db_path)[0]}_archive"
+        self.archive_after_days = archive_after_days
+        self._archive_manifest = {}
+        self._archived_asins = None
+
+        with self._file_lock():
+            self._reload()
+            self._open_bloom()
+
+    @contextmanager
+    def _file_lock(self):
+        """
+        Exclusive lock shared with other processes using the same database
+        Re-entrant within this process; a no-op where fcntl is unavailable
+        """
+        with self._lock:
+            if self._lock_depth or fcntl is None:
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _read_signature(self) -> tuple:
+        """(inode, mtime, size) of the snapshot and journal files"""
+        signature = []
+        for path in (self.db_path, self.journal_path):
+            try:
+                st = os.stat(path)
+                signature.append((st.st_ino, st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _refresh_if_changed(self):
+        """
+        Pick up writes made by other processes
+
+        A stat() per call; reloads only when the snapshot or journal really
+        changed. If only the journal grew, just the new tail is replayed.
+        """
+        if self._read_signature() == self._disk_signature:
+            return
+
+        with self._file_lock():
+            current = self._read_signature()
+            if current == self._disk_signature:
+                return
+
+            old_snapshot, old_journal = self._disk_signature or (None, None)
+            new_snapshot, new_journal = current
+            journal_grew = (self.journal and new_snapshot == old_snapshot
+                            and old_journal is not None and new_journal is not None
+                            and new_journal[0] == old_journal[0] and new_journal[2] > old_journal[2])
+
+            if journal_grew:
+                self._replay_journal_tail()
+                if self._journal_torn:
+                    self._compact_locked()
+                self._disk_signature = self._read_signature()
+            else:
+                self._reload()
+
+    def _reload(self):
+        """Full reload from disk (caller holds the file lock)"""
+        self._archive_manifest = self._load_archive_manifest()
+        self._archived_asins = None
         self.data = self._load_database()
+        self._rebuild_index()
+
+        if self.journal and (self._journal_torn or not self._journal_matches_snapshot()):
+            # Legacy snapshot, missing or torn journal: start a fresh journal generation
+            self._compact_locked()
+        elif not self.journal and self._journal_entries_replayed:
+            # Journal left behind by a journal-mode run: fold it in once
+            self._compact_locked()
+
+        if self._needs_archiving():
+            self._archive_old_months_locked()
+
+        self._disk_signature = self._read_signature()
     
     def _load_database(self) -> dict:
-        """Load database from file"""
+        """Load database from file and replay the journal"""
+        data = {'products': []}
         if os.path.exists(self.db_path):
             try:
                 with open(self.db_path, 'r') as f:
-                    return json.load(f)
+                    data = json.load(f)
             except Exception as e:
                 print(f"Error loading database: {e}")
-                return {'products': []}
-        return {'products': []}
+                data = {'products': []}
+
+        self._journal_torn = False
+        self._journal_offset = 0
+        self._journal_entries_replayed = self._replay_journal(data)
+        return data
+
+    def _replay_journal(self, data: dict) -> int:
+        """
+        Append journal entries belonging to the snapshot's journal generation
+        Returns number of replayed entries
+        """
+        if not os.path.exists(self.journal_path):
+            return 0
+
+        try:
+            with open(self.journal_path, 'rb') as f:
+                header = f.readline()
+                try:
+                    journal_id = json.loads(header).get('journal_id')
+                except ValueError:
+                    journal_id = None
+
+                if not journal_id or journal_id != data.get('journal_id'):
+                    # Stale journal from an interrupted compaction: already in the snapshot
+                    return 0
+
+                self._journal_offset = len(header)
+                return self._read_journal_records(f, data.setdefault('products', []))
+        except Exception as e:
+            print(f"Error replaying journal: {e}")
+            return 0
+
+    def _replay_journal_tail(self):
+        """Replay journal records appended by other processes since the last read"""
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(self._journal_offset)
+                new_entries = []
+                self._read_journal_records(f, new_entries)
+        except Exception as e:
+            print(f"Error replaying journal: {e}")
+            return
+
+        self.data.setdefault('products', []).extend(new_entries)
+        for entry in new_entries:
+            self._index_entry(entry)
+
+    def _read_journal_records(self, f, products: List[Dict]) -> int:
+        """Read complete journal lines from f into products, advancing the journal offset"""
+        replayed = 0
+        for line in f:
+            try:
+                if not line.endswith(b'\n'):
+                    raise ValueError('unterminated line')
+                record = json.loads(line)
+            except ValueError:
+                # Torn write at the tail of the journal
+                print("Warning: ignoring incomplete journal line")
+                self._journal_torn = True
+                break
+
+            batch = record.get('batch') if isinstance(record, dict) else None
+            if batch is not None:
+                products.extend(batch)
+                replayed += len(batch)
+            else:
+                products.append(record)
+                replayed += 1
+            self._journal_offset += len(line)
+
+        return replayed
+
+    def _journal_matches_snapshot(self) -> bool:
+        """Check that the on-disk journal belongs to the loaded snapshot"""
+        if not self.data.get('journal_id') or not os.path.exists(self.journal_path):
+            return False
+        try:
+            with open(self.journal_path, 'r') as f:
+                return json.loads(f.readline()).get('journal_id') == self.data['journal_id']
+        except Exception:
+            return False
+
+    def _write_atomic(self, path: str, content: str):
+        """Write file via temp file + fsync + rename so readers never see a partial file"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
     
-    def _save_database(self):
-        """Save database to file"""
+    def _commit(self, entries: List[Dict]):
+        """
+        Persist newly added entries (raises on failure, caller holds the file lock)
+        Snapshot mode rewrites the file once; journal mode appends once
+        """
+        if self._bloom is not None:
+            self._bloom.flush()
+
+        if not self.journal:
+            self._write_atomic(self.db_path, json.dumps(self.data, indent=2, default=str))
+            self._disk_signature = self._read_signature()
+            return
+
+        if len(entries) == 1:
+            record = entries[0]
+        else:
+            # A batch is a single line so a torn write drops all of it, never part
+            record = {'batch': entries}
+
+        line = (json.dumps(record, default=str) + '\n').encode()
+        with open(self.journal_path, 'ab') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_offset += len(line)
+        self._disk_signature = self._read_signature()
+
+        if self._disk_signature[1][2] > self.compact_threshold:
+            self._compact_in_background()
+
+    def _compact_in_background(self):
+        """Start a background compaction unless one is already running"""
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(target=self.compact, name='db-compaction', daemon=True)
+        self._compactor.start()
+
+    def compact(self):
+        """
+        Fold the journal into the snapshot
+
+        The snapshot is written first with a new journal generation id, then the
+        journal is replaced by an empty one carrying that id. A crash in between
+        leaves a stale journal that is ignored on replay.
+        """
         try:
-            with open(self.db_path, 'w') as f:
-                json.dump(self.data, f, indent=2, default=str)
+            with self._file_lock():
+                # Include entries other processes appended since our last read
+                self._refresh_if_changed()
+                self._compact_locked()
         except Exception as e:
-            print(f"Error saving database: {e}")
+            print(f"Error compacting database: {e}")
+
+    def _compact_locked(self):
+        """Compaction body (caller holds the file lock)"""
+        journal_id = uuid.uuid4().hex
+        self.data['journal_id'] = journal_id
+        self._write_atomic(self.db_path, json.dumps(self.data, indent=2, default=str))
+        if self.journal:
+            header = json.dumps({'journal_id': journal_id}) + '\n'
+            self._write_atomic(self.journal_path, header)
+            self._journal_offset = len(header.encode())
+        elif os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._journal_torn = False
+        self._disk_signature = self._read_signature()
     
+    def _archive_path(self, month: str) -> str:
+        return os.path.join(self.archive_dir, f"{month}.json.gz")
+
+    def _load_archive_manifest(self) -> dict:
+        """Per-month counts of archived partitions"""
+        manifest_path = os.path.join(self.archive_dir, 'manifest.json')
+        if not os.path.exists(manifest_path):
+            return {}
+        try:
+            with open(manifest_path, 'r') as f:
+                return json.load(f).get('months', {})
+        except Exception as e:
+            print(f"Error loading archive manifest: {e}")
+            return {}
+
+    def _archive_cutoff_month(self) -> str:
+        """Months before this one (YYYY-MM) belong in the archive"""
+        return (datetime.now() - timedelta(days=self.archive_after_days)).strftime('%Y-%m')
+
+    def _needs_archiving(self) -> bool:
+        """Cheap check: is the oldest indexed entry in an archivable month?"""
+        if not self._posted_ts:
+            return False
+        oldest_month = datetime.fromtimestamp(self._posted_ts[0]).strftime('%Y-%m')
+        return oldest_month < self._archive_cutoff_month()
+
+    def _archive_old_months_locked(self):
+        """
+        Move old months from the hot file into compressed partitions (caller holds the file lock)
+
+        Partitions are written before the hot file drops the entries; after a
+        crash in between, the next run merges them again without duplicating.
+        """
+        cutoff = self._archive_cutoff_month()
+        by_month = {}
+        keep = []
+        for product in self.data.get('products', []):
+            month = (_entry_day(product) or '')[:7]
+            if month and month < cutoff:
+                by_month.setdefault(month, []).append(product)
+            else:
+                keep.append(product)
+
+        if not by_month:
+            return
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        for month, entries in sorted(by_month.items()):
+            merged = self.get_archived_products(month)
+            seen = {(p.get('asin'), p.get('posted_at')) for p in merged}
+            merged.extend(p for p in entries if (p.get('asin'), p.get('posted_at')) not in seen)
+
+            tmp_path = f"{self._archive_path(month)}.tmp"
+            with gzip.open(tmp_path, 'wt') as f:
+                json.dump({'products': merged}, f, default=str)
+            os.replace(tmp_path, self._archive_path(month))
+
+            successful = sum(1 for p in merged if p.get('pin_created', False))
+            self._archive_manifest[month] = {'total': len(merged), 'successful': successful,
+                                             'asins': sorted({p.get('asin') or '' for p in merged})}
+
+        self._write_atomic(os.path.join(self.archive_dir, 'manifest.json'),
+                           json.dumps({'months': self._archive_manifest}, indent=2))
+
+        self.data['products'] = keep
+        self._archived_asins = None
+        self._rebuild_index()
+        self._compact_locked()
+        print(f"Archived {sum(len(e) for e in by_month.values())} entries from {len(by_month)} month(s)")
+
+    def get_archived_products(self, month: str) -> List[Dict]:
+        """Load one archived month (YYYY-MM); explicit historical query"""
+        path = self._archive_path(month)
+        if not os.path.exists(path):
+            return []
+        with gzip.open(path, 'rt') as f:
+            return json.load(f).get('products', [])
+
+    def iter_history(self):
+        """Every posted entry: recent ones first, then archived months newest to oldest"""
+        self._refresh_if_changed()
+        yield from reversed(self.data.get('products', []))
+        for month in sorted(self._archive_manifest, reverse=True):
+            yield from reversed(self.get_archived_products(month))
+
+    def get_monthly_stats(self, include_archive: bool = True) -> Dict[str, Dict]:
+        """Per-month totals; archived months come from the manifest without loading them"""
+        self._refresh_if_changed()
+        months = {}
+        if include_archive:
+            for month, counts in self._archive_manifest.items():
+                months[month] = {'total': counts['total'], 'successful': counts['successful']}
+
+        for product in self.data.get('products', []):
+            month = (_entry_day(product) or 'unknown')[:7]
+            counts = months.setdefault(month, {'total': 0, 'successful': 0})
+            counts['total'] += 1
+            if product.get('pin_created', False):
+                counts['successful'] += 1
+
+        for counts in months.values():
+            counts['failed'] = counts['total'] - counts['successful']
+        return dict(sorted(months.items()))
+
+    def _open_bloom(self):
+        """Map the all-time ASIN Bloom filter, rebuilding it if missing, stale or full"""
+        bloom = None
+        if os.path.exists(self.bloom_path):
+            try:
+                bloom = BloomFilter(self.bloom_path)
+            except Exception as e:
+                print(f"Error opening ASIN index, rebuilding: {e}")
+
+        if bloom is None or bloom.count < self._counters.total or bloom.count >= bloom.capacity:
+            if bloom is not None:
+                bloom.close()
+            capacity = max(BLOOM_MIN_CAPACITY, self._counters.total * 2)
+            bloom = BloomFilter.create(self.bloom_path, capacity, items=self._iter_history_asins())
+
+        if self._bloom is not None:
+            self._bloom.close()
+        self._bloom = bloom
+        self._bloom_inode = os.stat(self.bloom_path).st_ino
+
+    def _ensure_bloom_current(self):
+        """Re-map the Bloom filter if another process rebuilt it"""
+        try:
+            if os.stat(self.bloom_path).st_ino == self._bloom_inode:
+                return
+        except FileNotFoundError:
+            pass
+        with self._file_lock():
+            self._open_bloom()
+
+    def _iter_history_asins(self):
+        """Every ASIN in the posting history, archives included (one per entry)"""
+        for product in self.iter_history():
+            yield product.get('asin') or ''
+
+    def _bloom_add(self, entry: Dict):
+        """Record an entry in the Bloom filter, growing it when full"""
+        self._bloom.add(entry.get('asin') or '')
+        if self._bloom.count >= self._bloom.capacity:
+            self._open_bloom()
+
+    def has_ever_posted(self, asin: str) -> bool:
+        """
+        All-time repost check
+        The Bloom filter answers most misses; possible hits are confirmed exactly
+        """
+        if not asin:
+            return False
+
+        self._refresh_if_changed()
+        self._ensure_bloom_current()
+        if asin not in self._bloom:
+            return False
+        if any(p.get('asin') == asin for p in self.data.get('products', [])):
+            return True
+        return asin in self._get_archived_asins()
+
+    def _get_archived_asins(self) -> Set[str]:
+        """Every archived ASIN, from the manifest (months archived before it listed ASINs are read once)"""
+        if self._archived_asins is None:
+            asins = set()
+            for month, counts in self._archive_manifest.items():
+                if 'asins' not in counts:
+                    counts['asins'] = sorted({p.get('asin') or '' for p in self.get_archived_products(month)})
+                asins.update(counts['asins'])
+            self._archived_asins = asins
+        return self._archived_asins
+
     def save_product(self, product: Dict, pinterest_data: Dict, pin_created: bool):
         """Save product to database"""
-        entry = {
-            'asin': product.get('asin'),
-            'title': product.get('title'),
-            'price': product.get('price'),
-            'affiliate_link': product.get('affiliate_link'),
-            'pinterest_keyword': pinterest_data.get('keyword'),
-            'posted_at': datetime.now().isoformat(),
-            'pin_created': pin_created
-        }
+        entry = build_entry(product, pinterest_data, pin_created)
         
-        self.data.setdefault('products', []).append(entry)
-        self._save_database()
+        with self._file_lock():
+            self._refresh_if_changed()
+            if self._batch is None and self._needs_archiving():
+                self._archive_old_months_locked()
+            self._ensure_bloom_current()
+            self.data.setdefault('products', []).append(entry)
+            self._index_entry(entry)
+            self._bloom_add(entry)
+
+            if self._batch is not None:
+                self._batch.append(entry)
+                return
+
+            try:
+                self._commit([entry])
+            except Exception as e:
+                print(f"Error saving database: {e}")
+
+    def save_products(self, entries: List[Tuple[Dict, Dict, bool]]):
+        """Save several (product, pinterest_data, pin_created) results with one write"""
+        with self.batch():
+            for product, pinterest_data, pin_created in entries:
+                self.save_product(product, pinterest_data, pin_created)
+
+    @contextmanager
+    def batch(self):
+        """
+        Buffer save_product calls and commit them once on exit
+
+        All or nothing: if the block raises or the write fails, the buffered
+        entries are dropped from memory and nothing reaches disk. Other
+        processes wait on the file lock until the batch is committed.
+        """
+        with self._file_lock():
+            if self._batch is not None:
+                # Nested batch joins the outer one
+                yield self
+                return
+
+            self._refresh_if_changed()
+            if self._needs_archiving():
+                self._archive_old_months_locked()
+            self._batch = []
+            mark = len(self.data.setdefault('products', []))
+            try:
+                yield self
+                if self._batch:
+                    self._commit(self._batch)
+            except Exception:
+                del self.data['products'][mark:]
+                self._rebuild_index()
+                raise
+            finally:
+                self._batch = None
     
-    def get_recently_posted(self, days: int = 7) -> List[str]:
-        """Get list of ASINs posted in last N days"""
-        cutoff_date = datetime.now() - timedelta(days=days)
-        
-        recent = []
+    def get_recently_posted(self, days: int = 7) -> Set[str]:
+        """
+        Get set of ASINs posted in last N days
+        Windows reaching into archived months also read those partitions
+        """
+        self._refresh_if_changed()
+        cutoff = _cutoff_timestamp(days)
+        start = bisect.bisect_left(self._posted_ts, cutoff)
+        asins = set(self._posted_asins[start:])
+
+        first_month = datetime.fromtimestamp(cutoff).strftime('%Y-%m')
+        for month in self._archive_manifest:
+            if month < first_month:
+                continue
+            for product in self.get_archived_products(month):
+                ts = _parse_timestamp(product.get('posted_at'))
+                if ts is not None and ts >= cutoff:
+                    asins.add(product.get('asin'))
+        return asins
+
+    def _count_posted_since(self, days: int) -> int:
+        """Count entries posted in last N days"""
+        return self._counters.count_since(days, self._count_posted_between)
+
+    def _count_posted_between(self, start_ts: float, end_ts: float) -> int:
+        """Count entries with start_ts <= posted_at < end_ts"""
+        return (bisect.bisect_left(self._posted_ts, end_ts)
+                - bisect.bisect_left(self._posted_ts, start_ts))
+
+    def _rebuild_index(self):
+        """Build the posted_at-ordered index and stats counters"""
+        self._counters = StatsCounters()
+        indexed = []
         for product in self.data.get('products', []):
-            posted_at = product.get('posted_at')
-            if posted_at:
-                try:
-                    posted_date = datetime.fromisoformat(posted_at)
-                    if posted_date >= cutoff_date:
-                        recent.append(product.get('asin'))
-                except:
-                    pass
-        
-        return recent
+            self._counters.add(product)
+            ts = _parse_timestamp(product.get('posted_at'))
+            if ts is not None:
+                indexed.append((ts, product.get('asin')))
+
+        # Archived months count towards totals; they are never inside the stats windows
+        for counts in self._archive_manifest.values():
+            self._counters.total += counts['total']
+            self._counters.successful += counts['successful']
+
+        indexed.sort(key=lambda item: item[0])
+        self._posted_ts = [ts for ts, _ in indexed]
+        self._posted_asins = [asin for _, asin in indexed]
+
+    def _index_entry(self, entry: Dict):
+        """Add a single entry to the posted_at index and stats counters"""
+        self._counters.add(entry)
+        ts = _parse_timestamp(entry.get('posted_at'))
+        if ts is None:
+            return
+
+        if not self._posted_ts or ts >= self._posted_ts[-1]:
+            self._posted_ts.append(ts)
+            self._posted_asins.append(entry.get('asin'))
+        else:
+            position = bisect.bisect_right(self._posted_ts, ts)
+            self._posted_ts.insert(position, ts)
+            self._posted_asins.insert(position, entry.get('asin'))
     
-    def get_product_stats(self) -> Dict:
-        """Get statistics about posted products"""
-        products = self.data.get('products', [])
-        
-        stats = {
-            'total': len(products),
-            'successful': len([p for p in products if p.get('pin_created', False)]),
-            'failed': len([p for p in products if not p.get('pin_created', False)]),
-            'last_7_days': len(self.get_recently_posted(7)),
-            'last_30_days': len(self.get_recently_posted(30))
-        }
-        
-        return stats
+    def get_product_stats(self, fresh: bool = True) -> Dict:
+        """
+        Get statistics about posted products
+        fresh=False returns the cached snapshot (kept current by saves; window
+        counts are only re-aged on the next fresh call)
+        """
+        if not fresh and self._counters.snapshot is not None:
+            return dict(self._counters.snapshot)
+        self._refresh_if_changed()
+        return self._counters.refresh(self._count_posted_between)
+
+
+class SQLiteProductDatabase:
+    """
+    SQLite storage backend with the same API as ProductDatabase
+    Each save is a single indexed INSERT instead of a full file rewrite
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            asin TEXT,
+            title TEXT,
+            price,
+            affiliate_link TEXT,
+            pinterest_keyword TEXT,
+            posted_at TEXT NOT NULL,
+            pin_created INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_products_asin ON products (asin);
+        CREATE INDEX IF NOT EXISTS idx_products_posted_at ON products (posted_at);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    COLUMNS = ('asin', 'title', 'price', 'affiliate_link', 'pinterest_keyword', 'posted_at', 'pin_created')
+
+    def __init__(self, db_path: str = 'posted_products.db'):
+        self.db_path = db_path
+        self.conn = self._connect()
+        self._batch = None
+        self._load_counters()
+
+    def _data_version(self) -> int:
+        """Changes whenever another connection commits to the database"""
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _refresh_if_changed(self):
+        """Reload cached counters only if another process wrote since the last load"""
+        if self._data_version() != self._loaded_version:
+            self._load_counters()
+
+    def _load_counters(self):
+        """Load stats counters and per-day buckets with two aggregate queries"""
+        self._loaded_version = self._data_version()
+        self._counters = StatsCounters()
+        total, successful = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(pin_created), 0) FROM products"
+        ).fetchone()
+        self._counters.total = total
+        self._counters.successful = successful
+        self._counters.daily = dict(self.conn.execute(
+            "SELECT substr(posted_at, 1, 10), COUNT(*) FROM products GROUP BY 1"
+        ))
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open connection, enable WAL mode and create schema"""
+        # SQLite does the cross-process locking; wait for other writers instead of failing
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(self.SCHEMA)
+        return conn
+
+    def _insert_entries(self, entries: List[Dict]):
+        """Insert entries (caller owns the transaction)"""
+        placeholders = ', '.join('?' for _ in self.COLUMNS)
+        self.conn.executemany(
+            f"INSERT INTO products ({', '.join(self.COLUMNS)}) VALUES ({placeholders})",
+            [tuple(entry.get(col) for col in self.COLUMNS) for entry in entries]
+        )
+
+    def save_product(self, product: Dict, pinterest_data: Dict, pin_created: bool):
+        """Save product to database"""
+        entry = build_entry(product, pinterest_data, pin_created)
+
+        if self._batch is not None:
+            self._batch.append(entry)
+            return
+
+        try:
+            with self.conn:
+                self._insert_entries([entry])
+            self._counters.add(entry)
+        except Exception as e:
+            print(f"Error saving database: {e}")
+
+    def save_products(self, entries: List[Tuple[Dict, Dict, bool]]):
+        """Save several (product, pinterest_data, pin_created) results in one transaction"""
+        with self.batch():
+            for product, pinterest_data, pin_created in entries:
+                self.save_product(product, pinterest_data, pin_created)
+
+    @contextmanager
+    def batch(self):
+        """Buffer save_product calls and insert them in a single transaction on exit"""
+        if self._batch is not None:
+            yield self
+            return
+
+        self._batch = []
+        try:
+            yield self
+            entries = self._batch
+            if entries:
+                with self.conn:
+                    self._insert_entries(entries)
+                for entry in entries:
+                    self._counters.add(entry)
+        finally:
+            self._batch = None
+
+    def get_recently_posted(self, days: int = 7) -> Set[str]:
+        """Get set of ASINs posted in last N days"""
+        cutoff_date = datetime.now() - timedelta(days=days)
+        rows = self.conn.execute(
+            "SELECT DISTINCT asin FROM products WHERE posted_at >= ?",
+            (cutoff_date.isoformat(),)
+        )
+        return {row[0] for row in rows}
+
+    def _count_posted_since(self, days: int) -> int:
+        """Count entries posted in last N days"""
+        return self._counters.count_since(days, self._count_posted_between)
+
+    def _count_posted_between(self, start_ts: float, end_ts: float) -> int:
+        """Count entries in [start_ts, end_ts) through the posted_at index"""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM products WHERE posted_at >= ? AND posted_at < ?",
+            (datetime.fromtimestamp(start_ts).isoformat(), datetime.fromtimestamp(end_ts).isoformat())
+        ).fetchone()[0]
+
+    def get_product_stats(self, fresh: bool = True) -> Dict:
+        """
+        Get statistics about posted products
+        fresh=False returns the cached snapshot without querying SQLite
+        """
+        if not fresh and self._counters.snapshot is not None:
+            return dict(self._counters.snapshot)
+        self._refresh_if_changed()
+        return self._counters.refresh(self._count_posted_between)
+
+    def has_ever_posted(self, asin: str) -> bool:
+        """All-time repost check through the asin index"""
+        if not asin:
+            return False
+        return self.conn.execute(
+            "SELECT 1 FROM products WHERE asin = ? LIMIT 1", (asin,)
+        ).fetchone() is not None
+
+    def import_json(self, json_path: str) -> int:
+        """
+        One-shot import of an existing posted_products.json file, including
+        the archived months in its <name>_archive partitions
+        Returns number of imported entries (0 if this file was already imported)
+        """
+        source = os.path.abspath(json_path)
+        already = self.conn.execute(
+            "SELECT 1 FROM meta WHERE key = ?", (f'imported:{source}',)
+        ).fetchone()
+        if already:
+            print(f"Database {json_path} was already imported, skipping")
+            return 0
+
+        with open(json_path, 'r') as f:
+            data = json.load(f)
+
+        # An interrupted archive run can leave a month in both places
+        entries = []
+        seen = set()
+        for product in list(_read_archived_entries(json_path)) + data.get('products', []):
+            key = (product.get('asin'), product.get('posted_at'))
+            if product.get('posted_at') and key not in seen:
+                seen.add(key)
+                entries.append(product)
+        for entry in entries:
+            entry['pin_created'] = bool(entry.get('pin_created', False))
+
+        with self.conn:
+            self._insert_entries(entries)
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?)",
+                (f'imported:{source}', datetime.now().isoformat())
+            )
+
+        self._load_counters()
+        return len(entries)
+
+    def close(self):
+        """Close the SQLite connection"""
+        self.conn.close()
+
+
+def open_database(db_path: str = DEFAULT_DB_PATH):
+    """Open the storage backend matching the database file extension"""
+    if db_path.endswith(SQLITE_EXTENSIONS):
+        return SQLiteProductDatabase(db_path)
+    return ProductDatabase(db_path, journal=DB_JOURNAL_MODE)
+
+def _read_archived_entries(json_path: str):
+    """Entries of every archived month listed in the manifest next to a JSON database"""
+    archive_dir = f"{os.path.splitext(json_path)[0]}_archive"
+    manifest_path = os.path.join(archive_dir, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return
+    with open(manifest_path, 'r') as f:
+        months = json.load(f).get('months', {})
+    for month in sorted(months):
+        with gzip.open(os.path.join(archive_dir, f"{month}.json.gz"), 'rt') as f:
+            yield from json.load(f).get('products', [])
+
+
+def import_json_database(json_path: str, sqlite_path: str) -> int:
+    """Import an existing JSON database into a SQLite database"""
+    db = SQLiteProductDatabase(sqlite_path)
+    try:
+        return db.import_json(json_path)
+    finally:
+        db.close()
 
 
 # Global instance
 _db_instance = None
 
-def get_db() -> ProductDatabase:
-    """Get database instance"""
+def get_db():
+    """Get database instance (backend chosen from PRODUCT_DB_PATH)"""
     global _db_instance
     if _db_instance is None:
-        _db_instance = ProductDatabase()
+        _db_instance = open_database()
     return _db_instance
 
 def save_product(product: Dict, pinterest_data: Dict, pin_created: bool):
@@ -95,15 +965,25 @@ def save_product(product: Dict, pinterest_data: Dict, pin_created: bool):
     db = get_db()
     db.save_product(product, pinterest_data, pin_created)
 
-def get_recently_posted(days: int = 7) -> List[str]:
+def save_products(entries: List[Tuple[Dict, Dict, bool]]):
+    """Save a batch of (product, pinterest_data, pin_created) results atomically"""
+    db = get_db()
+    db.save_products(entries)
+
+def get_recently_posted(days: int = 7) -> Set[str]:
     """Get recently posted ASINs"""
     db = get_db()
     return db.get_recently_posted(days)
 
-def get_stats() -> Dict:
-    """Get product statistics"""
+def has_ever_posted(asin: str) -> bool:
+    """Check whether an ASIN was ever posted"""
+    db = get_db()
+    return db.has_ever_posted(asin)
+
+def get_stats(fresh: bool = True) -> Dict:
+    """Get product statistics (fresh=False returns the cached snapshot)"""
     db = get_db()
-    return db.get_product_stats()
+    return db.get_product_stats(fresh)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,212 @@
+"""
+On-Disk Image Cache
+Content-addressed cache for downloaded product images and their derived variants
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Optional
+
+import requests
+
+
+def read_limited(response: requests.Response, max_size: Optional[int] = None) -> bytes:
+    """
+    Read a streamed response body, refusing bodies larger than max_size bytes
+    The limit is checked against Content-Length first and again while reading
+    """
+    length = response.headers.get('Content-Length')
+    if max_size and length and length.isdigit() and int(length) > max_size:
+        raise ValueError(f"Image too large: {length} bytes (limit {max_size})")
+
+    chunks = []
+    total = 0
+    for chunk in response.iter_content(chunk_size=64 * 1024):
+        total += len(chunk)
+        if max_size and total > max_size:
+            raise ValueError(f"Image too large: over {max_size} bytes")
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+class ImageCache:
+    """
+    Cache directory keyed by a hash of the image URL
+
+    <key>.img         raw download
+    <key>.meta.json   ETag / Last-Modified / fetch time of the raw download
+    <key>.<name>.jpg  derived variants (upscaled, pinterest_optimized, ...)
+    <key>.result      results keyed by content rather than URL (see result_path)
+    *.index           indexes kept next to the cache (never evicted)
+
+    Raw images are served without network access for `ttl` seconds, then
+    revalidated with a conditional GET. When the origin returns new content,
+    the variants derived from the old content are dropped. Total size is
+    capped at `max_bytes` with least-recently-used eviction (file mtime is
+    bumped on every hit).
+    """
+
+    def __init__(self, cache_dir: str = '.image_cache', max_bytes: int = 500 * 1024 * 1024,
+                 ttl: int = 86400):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _path(self, url: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, f"{self.key(url)}.{suffix}")
+
+    def _read_meta(self, url: str) -> dict:
+        try:
+            with open(self._path(url, 'meta.json'), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_file(self, path: str, data: bytes):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _touch(self, path: str):
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def raw_path(self, url: str) -> Optional[str]:
+        """Path of the cached raw download (fresh or not), or None"""
+        path = self._path(url, 'img')
+        return path if os.path.exists(path) else None
+
+    def fetch(self, url: str, session: requests.Session, timeout: float = 10,
+              max_size: Optional[int] = None) -> Optional[str]:
+        """
+        Return the path of the cached raw image, downloading or revalidating as needed
+        Raises requests exceptions like a plain download would, and ValueError
+        for bodies over max_size bytes
+        """
+        raw_path = self._path(url, 'img')
+        meta = self._read_meta(url)
+
+        if os.path.exists(raw_path) and meta:
+            if time.time() - meta.get('fetched_at', 0) < self.ttl:
+                self._touch(raw_path)
+                return raw_path
+
+            headers = {}
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        else:
+            headers = {}
+
+        with session.get(url, timeout=timeout, headers=headers, stream=True) as response:
+            if response.status_code == 304:
+                meta['fetched_at'] = time.time()
+                self._write_file(self._path(url, 'meta.json'), json.dumps(meta).encode())
+                self._touch(raw_path)
+                return raw_path
+
+            response.raise_for_status()
+            self._store_raw(url, response, read_limited(response, max_size))
+        return raw_path
+
+    def _store_raw(self, url: str, response: requests.Response, content: bytes):
+        """Store a fresh download; variants of the previous content are stale"""
+        raw_path = self._path(url, 'img')
+        digest = hashlib.sha256(content).hexdigest()
+
+        if self._read_meta(url).get('sha256') != digest:
+            self._drop_variants(url)
+
+        self._write_file(raw_path, content)
+        meta = {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'sha256': digest,
+            'fetched_at': time.time()
+        }
+        self._write_file(self._path(url, 'meta.json'), json.dumps(meta).encode())
+        self.evict()
+
+    def _drop_variants(self, url: str):
+        prefix = f"{self.key(url)}."
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.startswith(prefix) and entry.name.endswith('.jpg'):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    def variant_path(self, url: str, name: str) -> Optional[str]:
+        """Path of a cached derived variant, or None"""
+        path = self._path(url, f"{name}.jpg")
+        if os.path.exists(path):
+            self._touch(path)
+            return path
+        return None
+
+    def store_variant(self, url: str, name: str, src_path: str) -> str:
+        """Copy a derived image into the cache"""
+        path = self._path(url, f"{name}.jpg")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        shutil.copyfile(src_path, tmp_path)
+        os.replace(tmp_path, path)
+        self.evict()
+        return path
+
+    def result_path(self, key: str) -> Optional[str]:
+        """
+        Path of a cached result stored under a caller-computed content key, or None
+        Unlike variants, these survive URL changes and source revalidation
+        """
+        path = os.path.join(self.cache_dir, f"{key}.result")
+        if os.path.exists(path):
+            self._touch(path)
+            return path
+        return None
+
+    def store_result(self, key: str, data: bytes) -> str:
+        """Store result bytes under a content key"""
+        path = os.path.join(self.cache_dir, f"{key}.result")
+        self._write_file(path, data)
+        self.evict()
+        return path
+
+    def evict(self):
+        """Remove least recently used files until the cache fits in max_bytes"""
+        with self._lock:
+            files = []
+            total = 0
+            for entry in os.scandir(self.cache_dir):
+                if not entry.is_file() or entry.name.endswith(('.tmp', '.index')):
+                    continue
+                st = entry.stat()
+                files.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            for _, size, path in sorted(files):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                if total <= self.max_bytes:
+                    break
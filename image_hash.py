@@ -0,0 +1,179 @@
+"""
+Perceptual Image Hashing
+dHash/pHash fingerprints and a BK-tree index for finding near-duplicate images
+"""
+
+import json
+import math
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # Optional: dhash falls back to pure Python, phash is unavailable
+
+
+HASH_SIZE = 8  # 8x8 = 64-bit hashes
+
+
+def dhash(img: Image.Image, hash_size: int = HASH_SIZE) -> int:
+    """Difference hash: sign of the horizontal gradient on a (hash_size+1) x hash_size grayscale thumbnail"""
+    small = img.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+    if np is None:
+        pixels = list(small.getdata())
+        bits = [pixels[row * (hash_size + 1) + col] < pixels[row * (hash_size + 1) + col + 1]
+                for row in range(hash_size) for col in range(hash_size)]
+        return int(''.join('1' if bit else '0' for bit in bits), 2)
+
+    pixels = np.asarray(small, dtype=np.int16)
+    return _bits_to_int(pixels[:, :-1] < pixels[:, 1:])
+
+
+_dct_matrices = {}
+
+def _dct_matrix(n: int):
+    """Orthonormal DCT-II basis (n x n), so a 2-D DCT is two matrix products"""
+    if n not in _dct_matrices:
+        k = np.arange(n)[:, None]
+        matrix = np.cos(math.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n)) * math.sqrt(2 / n)
+        matrix[0] /= math.sqrt(2)
+        _dct_matrices[n] = matrix
+    return _dct_matrices[n]
+
+
+def phash(img: Image.Image, hash_size: int = HASH_SIZE, highfreq_factor: int = 4) -> int:
+    """
+    Perceptual hash: low-frequency DCT coefficients of a 32x32 grayscale
+    thumbnail compared with their median. Robust to rescaling, re-encoding
+    and small colour changes. Requires NumPy.
+    """
+    if np is None:
+        raise RuntimeError("phash requires numpy")
+
+    size = hash_size * highfreq_factor
+    pixels = np.asarray(img.convert('L').resize((size, size), Image.LANCZOS), dtype=np.float64)
+    dct = _dct_matrix(size)
+    low = (dct @ pixels @ dct.T)[:hash_size, :hash_size]
+    # The DC term only encodes brightness; leave it out of the median
+    return _bits_to_int(low > np.median(low.ravel()[1:]))
+
+
+def _bits_to_int(bits) -> int:
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits"""
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over integer hashes with Hamming distance
+
+    Range queries use the triangle inequality to skip every subtree whose edge
+    distance lies outside [d - max_distance, d + max_distance], so a lookup
+    with a small radius visits a small fraction of the stored hashes.
+    """
+
+    def __init__(self):
+        self._root = None  # [hash, items, {distance: child}]
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, hash_value: int, item):
+        self._size += 1
+        if self._root is None:
+            self._root = [hash_value, [item], {}]
+            return
+
+        node = self._root
+        while True:
+            distance = hamming(hash_value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [hash_value, [item], {}]
+                return
+            node = child
+
+    def find(self, hash_value: int, max_distance: int) -> List[Tuple[int, object]]:
+        """All (distance, item) within max_distance, closest first"""
+        matches = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(hash_value, node[0])
+            if distance <= max_distance:
+                matches.extend((distance, item) for item in node[1])
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+
+class ImageHashIndex:
+    """
+    Perceptual hashes of processed images, keyed by URL
+
+    Persisted as JSON ({url: hex hash}) and searched through an in-memory
+    BK-tree rebuilt on load. One file per hash kind, since dHash and pHash
+    values are not comparable.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.hashes: Dict[str, int] = {}
+        self._tree = BKTree()
+
+        try:
+            with open(path, 'r') as f:
+                self.hashes = {url: int(value, 16) for url, value in json.load(f).items()}
+        except (OSError, ValueError):
+            pass
+        for url, hash_value in self.hashes.items():
+            self._tree.add(hash_value, url)
+
+    def find(self, hash_value: int, max_distance: int, exclude: str = None) -> Optional[Tuple[int, str]]:
+        """Closest indexed (distance, url) within max_distance, other than `exclude`"""
+        with self._lock:
+            for distance, url in self._tree.find(hash_value, max_distance):
+                if url != exclude:
+                    return distance, url
+        return None
+
+    def add(self, url: str, hash_value: int, save: bool = True):
+        with self._lock:
+            previous = self.hashes.get(url)
+            if previous == hash_value:
+                return
+            self.hashes[url] = hash_value
+            if previous is None:
+                self._tree.add(hash_value, url)
+            else:
+                # Content behind the URL changed: BK-trees cannot delete, so rebuild
+                self._tree = BKTree()
+                for indexed_url, indexed_hash in self.hashes.items():
+                    self._tree.add(indexed_hash, indexed_url)
+        if save:
+            self.save()
+
+    def save(self):
+        """Write the index via temp file + rename"""
+        with self._lock:
+            content = json.dumps({url: f"{value:016x}" for url, value in self.hashes.items()})
+        tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, self.path)
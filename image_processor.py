@@ -3,20 +3,229 @@ Image Processing and Upscaling Module
 Handles image downloads, upscaling, and Pinterest optimization
 """
 
+import hashlib
+import math
 import requests
-from PIL import Image
+from requests.adapters import HTTPAdapter
+from PIL import Image, ImageChops, ImageFile
 import io
 import os
-from typing import List, Optional
+import re
+import shutil
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 import replicate
 
+try:
+    import numpy as np
+except ImportError:
+    np = None  # Optional: content_bbox falls back to PIL
+
+from image_cache import ImageCache, read_limited
+from image_hash import BKTree, ImageHashIndex, dhash, phash
+from workspace import Workspace
+
+
+REPLICATE_MODEL = "nightmareai/real-esrgan:42fed1c4974146d4d2414e2be2c5277c7fcf05fcc3a73abf41610695738c1d7b"
+
+
+# Amazon image CDN: https://m.media-amazon.com/images/I/<id>[._<modifiers>_].<ext>
+AMAZON_IMAGE_URL = re.compile(
+    r'^(?P<base>https?://[^/]*(?:media-amazon|ssl-images-amazon|images-amazon)\.com/images/I/[^./]+)'
+    r'(?:\.(?P<modifiers>_[^/]*?_))?\.(?P<ext>jpg|jpeg|png|gif|webp)$', re.IGNORECASE)
+AMAZON_SIZE_TOKEN = re.compile(r'^(?:SL|SX|SY|UL|UX|UY|SS)\d+$')
+# Longest-side sizes requested from the CDN (common listing sizes, so CDN caches stay warm)
+AMAZON_SIZE_STEPS = (160, 300, 500, 679, 879, 1000, 1200, 1500, 2000, 2560)
+
+
+def amazon_sized_url(url: str, longest_side: int, extra_steps: int = 0) -> str:
+    """
+    Rewrite an Amazon image URL to request the smallest standard size with
+    at least `longest_side` pixels on the longest side (._AC_SL1500_. -> ._AC_SL1000_.),
+    or `extra_steps` standard sizes above that
+    Other modifiers (AC, crops) are kept; non-Amazon URLs are returned unchanged
+    """
+    match = AMAZON_IMAGE_URL.match(url)
+    if not match:
+        return url
+    
+    step = next((i for i, step in enumerate(AMAZON_SIZE_STEPS) if step >= longest_side),
+                len(AMAZON_SIZE_STEPS) - 1)
+    size = AMAZON_SIZE_STEPS[min(step + extra_steps, len(AMAZON_SIZE_STEPS) - 1)]
+    tokens = [token for token in (match.group('modifiers') or '').strip('_').split('_')
+              if token and not AMAZON_SIZE_TOKEN.match(token)]
+    tokens.append(f"SL{size}")
+    return f"{match.group('base')}._{'_'.join(tokens)}_.{match.group('ext')}"
+
+
+def _content_mask(img: Image.Image, tolerance: int):
+    """Boolean array, True where a pixel differs from white by more than tolerance"""
+    pixels = np.asarray(img)
+    if pixels.ndim == 3:
+        pixels = np.minimum(np.minimum(pixels[..., 0], pixels[..., 1]), pixels[..., 2])
+    return pixels < 255 - tolerance
+
+
+def content_bbox(img: Image.Image, tolerance: int = 12, sample_size: int = 512) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Bounding box (left, top, right, bottom) of the non-white pixels, or None for a blank image
+    
+    Vectorized with NumPy on a nearest-neighbour sample of at most
+    sample_size pixels per side, then each edge is refined to the exact pixel
+    by scanning only the band between the last background sample and the
+    first content sample. Cost barely grows with image size. Isolated specks
+    smaller than the sample step that lie outside the product are ignored.
+    """
+    if np is None:
+        return content_bbox_pil(img, tolerance)
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    
+    width, height = img.size
+    step = max(1, max(width, height) // sample_size)
+    sample_w, sample_h = math.ceil(width / step), math.ceil(height / step)
+    mask = _content_mask(img.resize((sample_w, sample_h), Image.NEAREST), tolerance)
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if not len(rows):
+        return None
+    
+    def x_at(i):  # source column of sample column i (Image.NEAREST mapping)
+        return min(width - 1, (2 * i + 1) * width // (2 * sample_w))
+    
+    def y_at(i):
+        return min(height - 1, (2 * i + 1) * height // (2 * sample_h))
+    
+    r0, r1, c0, c1 = rows[0], rows[-1], cols[0], cols[-1]
+    # Widest region content can occupy: up to the neighbouring background samples
+    x_lo = x_at(c0 - 1) + 1 if c0 > 0 else 0
+    x_hi = x_at(c1 + 1) if c1 < sample_w - 1 else width
+    y_lo = y_at(r0 - 1) + 1 if r0 > 0 else 0
+    y_hi = y_at(r1 + 1) if r1 < sample_h - 1 else height
+    
+    top = y_lo + np.flatnonzero(_content_mask(img.crop((x_lo, y_lo, x_hi, y_at(r0) + 1)), tolerance).any(axis=1))[0]
+    bottom = y_at(r1) + np.flatnonzero(_content_mask(img.crop((x_lo, y_at(r1), x_hi, y_hi)), tolerance).any(axis=1))[-1]
+    left = x_lo + np.flatnonzero(_content_mask(img.crop((x_lo, y_lo, x_at(c0) + 1, y_hi)), tolerance).any(axis=0))[0]
+    right = x_at(c1) + np.flatnonzero(_content_mask(img.crop((x_at(c1), y_lo, x_hi, y_hi)), tolerance).any(axis=0))[-1]
+    return int(left), int(top), int(right) + 1, int(bottom) + 1
+
+
+def content_bbox_pil(img: Image.Image, tolerance: int = 12) -> Optional[Tuple[int, int, int, int]]:
+    """Pure-PIL content_bbox: exact, but touches every pixel several times"""
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    
+    diff = ImageChops.difference(img, Image.new(img.mode, img.size, 'white'))
+    if img.mode == 'RGB':
+        red, green, blue = diff.split()
+        diff = ImageChops.lighter(ImageChops.lighter(red, green), blue)
+    return diff.point(lambda v: 255 if v > tolerance else 0).getbbox()
+
+
+def ssim(img_a: Image.Image, img_b: Image.Image, block: int = 8) -> float:
+    """
+    Mean structural similarity of two same-size images (luminance, 8x8 blocks)
+    Block statistics are computed with vectorized NumPy reshapes. Requires NumPy.
+    """
+    a = np.asarray(img_a.convert('L'), dtype=np.float32)
+    b = np.asarray(img_b.convert('L'), dtype=np.float32)
+    height, width = (a.shape[0] // block) * block, (a.shape[1] // block) * block
+    a = a[:height, :width].reshape(height // block, block, width // block, block)
+    b = b[:height, :width].reshape(height // block, block, width // block, block)
+    
+    mean_a, mean_b = a.mean(axis=(1, 3)), b.mean(axis=(1, 3))
+    var_a, var_b = a.var(axis=(1, 3)), b.var(axis=(1, 3))
+    covariance = (a * b).mean(axis=(1, 3)) - mean_a * mean_b
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    
+    scores = ((2 * mean_a * mean_b + c1) * (2 * covariance + c2)) / \
+             ((mean_a ** 2 + mean_b ** 2 + c1) * (var_a + var_b + c2))
+    return float(scores.mean())
+
+
+# Pinterest formats for render_variants: name -> (width, height)
+PIN_FORMATS = {
+    'standard': (1000, 1500),  # 2:3 pin
+    'square': (1000, 1000),
+    'idea': (1080, 1920)       # 9:16 idea pin
+}
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def get_http_session(pool_size: int = 10) -> requests.Session:
+    """
+    Shared keep-alive session (one per pool size)
+    Reusing connections skips a TCP+TLS handshake per image download
+    """
+    with _sessions_lock:
+        session = _sessions.get(pool_size)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[pool_size] = session
+        return session
+
 
 class ImageProcessor:
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, replicate_client=None, workspace: Workspace = None):
         self.config = config
+        # Per-cycle directory for temp and output files (created on first use if not given)
+        self.workspace = workspace
+        # Anything with replicate's run() / predictions.create() interface
+        self.replicate_client = replicate_client or replicate
         self.target_width = config.get('image_processing', {}).get('target_width', 1000)
         self.target_height = config.get('image_processing', {}).get('target_height', 1500)
         self.upscale_method = config.get('image_processing', {}).get('upscale_using', 'replicate')
+        self.download_timeout = config.get('image_processing', {}).get('download_timeout', 10)
+        self.download_workers = config.get('image_processing', {}).get('download_workers', 4)
+        self.max_download_bytes = config.get('image_processing', {}).get('max_download_mb', 20) * 1024 * 1024
+        self.probe_max_bytes = config.get('image_processing', {}).get('probe_max_kb', 64) * 1024
+        self.min_image_size = config.get('image_processing', {}).get('min_image_size', 300)
+        self.cdn_resize = config.get('image_processing', {}).get('cdn_resize', True)
+        self._probes = {}
+        self.in_memory = config.get('image_processing', {}).get('in_memory', True)
+        self.jpeg_draft = config.get('image_processing', {}).get('jpeg_draft', True)
+        self.reducing_gap = config.get('image_processing', {}).get('reducing_gap', 3.0)
+        self.output_format = config.get('image_processing', {}).get('output_format', 'jpeg').lower()
+        self.output_ext = '.webp' if self.output_format == 'webp' else '.jpg'
+        self.output_quality = config.get('image_processing', {}).get('output_quality', 95)
+        self.min_quality = config.get('image_processing', {}).get('min_quality', 60)
+        self.jpeg_progressive = config.get('image_processing', {}).get('jpeg_progressive', True)
+        self.webp_method = config.get('image_processing', {}).get('webp_method', 4)
+        max_output_kb = config.get('image_processing', {}).get('max_output_kb')
+        self.max_output_bytes = max_output_kb * 1024 if max_output_kb else None
+        self.min_ssim = config.get('image_processing', {}).get('min_ssim')
+        self.encode_stats = []
+        self.trim = config.get('image_processing', {}).get('trim_whitespace', True)
+        self.trim_tolerance = config.get('image_processing', {}).get('trim_tolerance', 12)
+        self.trim_margin = config.get('image_processing', {}).get('trim_margin', 0.03)
+        self.batch_workers = config.get('image_processing', {}).get('batch_workers', os.cpu_count() or 1)
+        self.replicate_min_upscale = config.get('image_processing', {}).get('replicate_min_upscale', 1.0)
+        self.replicate_model = config.get('image_processing', {}).get('replicate_model', REPLICATE_MODEL)
+        self.replicate_concurrency = config.get('image_processing', {}).get('replicate_concurrency', 4)
+        self.upscale_routes = Counter()
+        self.session = get_http_session(config.get('image_processing', {}).get('http_pool_size', 10))
+        
+        self.dedupe = config.get('image_processing', {}).get('dedupe_images', True)
+        self.dedupe_distance = config.get('image_processing', {}).get('dedupe_distance', 6)
+        self.dedupe_hash = config.get('image_processing', {}).get('dedupe_hash', 'phash' if np is not None else 'dhash')
+        self.duplicates = {}
+        self._hash_index = None
+        
+        self.cache = None
+        if config.get('image_processing', {}).get('cache_enabled', True):
+            self.cache = ImageCache(
+                cache_dir=config.get('image_processing', {}).get('cache_dir', '.image_cache'),
+                max_bytes=config.get('image_processing', {}).get('cache_max_mb', 500) * 1024 * 1024,
+                ttl=config.get('image_processing', {}).get('cache_ttl', 86400)
+            )
         
         if self.upscale_method == 'replicate':
             self.replicate_api_key = config.get('image_processing', {}).get('replicate_api_key')
@@ -26,15 +235,24 @@ class ImageProcessor:
     def download_image(self, url: str, save_path: str = None) -> Optional[str]:
         """Download image from URL"""
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
+            if self.cache is not None:
+                cached_path = self.cache.fetch(url, self.session, self.download_timeout,
+                                               self.max_download_bytes)
+                if save_path:
+                    shutil.copyfile(cached_path, save_path)
+                    return self._track(save_path)
+                with open(cached_path, 'rb') as f:
+                    return f.read()
             
-            image_data = response.content
+            # Streamed so oversized files are rejected instead of buffered
+            with self.session.get(url, timeout=self.download_timeout, stream=True) as response:
+                response.raise_for_status()
+                image_data = read_limited(response, self.max_download_bytes)
             
             if save_path:
                 with open(save_path, 'wb') as f:
                     f.write(image_data)
-                return save_path
+                return self._track(save_path)
             else:
                 # Return in-memory image
                 return image_data
@@ -43,12 +261,147 @@ class ImageProcessor:
             print(f"Error downloading image: {e}")
             return None
     
+    def download_images(self, urls: List[str], save_paths: List[str] = None) -> List:
+        """
+        Download several images concurrently over the shared session
+        Returns results in input order (None for failed downloads)
+        """
+        if not urls:
+            return []
+        
+        save_paths = save_paths or [None] * len(urls)
+        workers = max(1, min(self.download_workers, len(urls)))
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self.download_image, urls, save_paths))
+    
+    def probe_image(self, url: str) -> Optional[Dict]:
+        """
+        Read just enough of a remote image to learn its dimensions and format
+        
+        Streams the response into PIL's incremental parser and closes the
+        connection as soon as the header is parsed, or after probe_max_kb
+        without one. Already cached downloads are probed from disk.
+        Returns {'url', 'width', 'height', 'format', 'bytes'} or None
+        ('bytes' is the full file size when known). Results are remembered
+        for the lifetime of the processor.
+        """
+        if url not in self._probes:
+            self._probes[url] = self._probe_image(url)
+        return self._probes[url]
+    
+    def _probe_image(self, url: str) -> Optional[Dict]:
+        try:
+            raw_path = self.cache.raw_path(url) if self.cache is not None else None
+            if raw_path:
+                with Image.open(raw_path) as img:
+                    return {'url': url, 'width': img.width, 'height': img.height, 'format': img.format,
+                            'bytes': os.path.getsize(raw_path)}
+            
+            parser = ImageFile.Parser()
+            received = 0
+            # A Range request ends after probe_max_bytes, so the connection goes
+            # back to the pool; closing a full response mid-body would drop it
+            headers = {'Range': f"bytes=0-{self.probe_max_bytes - 1}"}
+            with self.session.get(url, timeout=self.download_timeout, stream=True, headers=headers) as response:
+                response.raise_for_status()
+                if response.status_code == 206:
+                    parser.feed(response.content)
+                    total = response.headers.get('Content-Range', '').rpartition('/')[2]
+                else:
+                    # Range ignored: read just enough of the full body
+                    total = response.headers.get('Content-Length')
+                    for chunk in response.iter_content(chunk_size=2048):
+                        parser.feed(chunk)
+                        received += len(chunk)
+                        if parser.image is not None or received >= self.probe_max_bytes:
+                            break
+            
+            if parser.image is None:
+                return None
+            width, height = parser.image.size
+            return {'url': url, 'width': width, 'height': height, 'format': parser.image.format,
+                    'bytes': int(total) if total and total.isdigit() else None}
+            
+        except Exception as e:
+            print(f"Error probing image: {e}")
+            return None
+    
+    def select_image(self, image_urls: List[str]) -> Optional[str]:
+        """
+        Pick the best candidate image by probing headers only
+        
+        Candidates smaller than min_image_size (short side), larger than
+        max_download_mb, or in formats PIL cannot resize well are skipped. Probing stops at the first candidate
+        that covers the target canvas; otherwise the one needing the least
+        upscaling wins, ties going to the aspect ratio closest to the target.
+        """
+        urls = [url for url in image_urls if url]
+        if len(urls) <= 1:
+            return urls[0] if urls else None
+        
+        target_aspect = self.target_width / self.target_height
+        best_url, best_score = None, None
+        for url in urls:
+            info = self.probe_image(url)
+            if not info or info['format'] not in ('JPEG', 'PNG', 'WEBP'):
+                continue
+            if min(info['width'], info['height']) < self.min_image_size:
+                continue
+            if info['bytes'] and info['bytes'] > self.max_download_bytes:
+                continue
+            
+            scale = min(self.target_width / info['width'], self.target_height / info['height'])
+            aspect_gap = abs(info['width'] / info['height'] - target_aspect)
+            score = (max(scale, 1.0), aspect_gap)
+            if best_score is None or score < best_score:
+                best_url, best_score = url, score
+            if scale <= 1:
+                # Covers the target: no upscaling needed, stop probing
+                break
+        
+        return best_url
+    
+    def right_size_url(self, url: str) -> str:
+        """
+        Ask Amazon's CDN for the smallest variant that still covers the target canvas
+        
+        The probed header gives the aspect ratio; the longest side of the
+        planned resample is what the CDN has to deliver. Saves transfer and
+        decode time for images that would otherwise be fetched at 1500px and
+        shrunk. The CDN never upscales, so asking for more than the original
+        just returns the original.
+        
+        With trim_whitespace on, the product's share of the frame is only known
+        after decoding, so one size step more than the full frame needs is
+        requested as headroom for the crop.
+        """
+        if not self.cdn_resize or not AMAZON_IMAGE_URL.match(url):
+            return url
+        
+        info = self.probe_image(url)
+        if not info:
+            return url
+        
+        longest_side = max(self.plan_resample((info['width'], info['height'])))
+        return amazon_sized_url(url, longest_side, extra_steps=1 if self.trim else 0)
+    
+    def resolve_image_url(self, image_urls: List[str]) -> Optional[str]:
+        """URL to download for a product: best candidate, right-sized on the CDN"""
+        url = self.select_image(image_urls)
+        return self.right_size_url(url) if url else None
+    
     def upscale_image(self, image_path: str, scale_factor: int = 2) -> Optional[str]:
         """
         Upscale image using chosen method
         Returns path to upscaled image
         """
         if self.upscale_method == 'replicate':
+            # Header-only open: reads the dimensions without decoding pixels
+            with Image.open(image_path) as img:
+                route = self.route_upscale(img.size)
+            if route != 'replicate':
+                return image_path
             return self._upscale_with_replicate(image_path)
         elif self.upscale_method == 'pil':
             return self._upscale_with_pil(image_path, scale_factor)
@@ -56,22 +409,132 @@ class ImageProcessor:
             # No upscaling
             return image_path
     
+    def route_upscale(self, size: Tuple[int, int]) -> str:
+        """
+        Pick the upscaler for a source of the given size: 'replicate', 'pil' or 'none'
+        
+        Only images that must grow by more than replicate_min_upscale go to
+        Replicate. Images already covering the target (or close to it) are
+        handled by the local resample in fit_to_canvas. Every decision is
+        counted in upscale_routes.
+        """
+        if self.upscale_method != 'replicate':
+            route = 'pil' if self.upscale_method == 'pil' else 'none'
+        else:
+            width, height = size
+            scale = min(self.target_width / width, self.target_height / height)
+            if scale <= 1:
+                route = 'none'
+            elif scale <= self.replicate_min_upscale:
+                route = 'pil'
+            else:
+                route = 'replicate'
+        
+        self.upscale_routes[route] += 1
+        return route
+    
+    def upscale_metrics(self) -> Dict[str, int]:
+        """Upscale routing counts, including Replicate calls avoided by routing or the cache"""
+        routes = self.upscale_routes
+        metrics = {f"routed_{route}": routes[route] for route in ('replicate', 'pil', 'none')}
+        metrics['replicate_cache_hits'] = routes['replicate_cache_hit']
+        metrics['replicate_calls'] = routes['replicate_call']
+        if self.upscale_method == 'replicate':
+            metrics['replicate_calls_avoided'] = routes['pil'] + routes['none'] + routes['replicate_cache_hit']
+        else:
+            metrics['replicate_calls_avoided'] = 0
+        return metrics
+    
+    def _run_replicate(self, image_file) -> Optional[bytes]:
+        """Send an image to Real-ESRGAN on Replicate and return the upscaled image bytes"""
+        self.upscale_routes['replicate_call'] += 1
+        output = self.replicate_client.run(self.replicate_model, input={"image": image_file})
+        return self._download_replicate_output(output)
+    
+    def _download_replicate_output(self, output) -> Optional[bytes]:
+        if isinstance(output, str):
+            response = self.session.get(output, timeout=self.download_timeout)
+            response.raise_for_status()
+            return response.content
+        
+        return None
+    
+    def _predict_replicate(self, image_data: bytes) -> Optional[bytes]:
+        """Create a Replicate prediction, wait for it and download the output"""
+        version = self.replicate_model.split(':')[-1]
+        prediction = self.replicate_client.predictions.create(
+            version=version, input={"image": io.BytesIO(image_data)})
+        prediction.wait()
+        
+        if prediction.status != 'succeeded':
+            raise RuntimeError(f"prediction {prediction.status}: {prediction.error}")
+        return self._download_replicate_output(prediction.output)
+    
+    def _replicate_cache_key(self, image_data: bytes) -> str:
+        """Cache key of an upscale result: source content hash + model version"""
+        source_hash = hashlib.sha256(image_data).hexdigest()
+        return hashlib.sha256(f"{self.replicate_model}:{source_hash}".encode('utf-8')).hexdigest()
+    
+    def _cached_replicate_result(self, key: str) -> Optional[bytes]:
+        if self.cache is None:
+            return None
+        cached_path = self.cache.result_path(key)
+        if not cached_path:
+            return None
+        self.upscale_routes['replicate_cache_hit'] += 1
+        with open(cached_path, 'rb') as f:
+            return f.read()
+    
+    def upscale_replicate_batch(self, images: List[bytes]) -> List[Optional[bytes]]:
+        """
+        Upscale several images on Replicate with bounded concurrency
+        
+        Cached results (same source bytes, same model version) are returned
+        without a call; identical sources in the batch are submitted once. Up to
+        replicate_concurrency predictions run at a time. Returns results in
+        input order, None where the prediction failed.
+        """
+        keys = [self._replicate_cache_key(data) for data in images]
+        results = {}
+        pending = {}
+        for key, data in zip(keys, images):
+            if key in results or key in pending:
+                continue
+            cached = self._cached_replicate_result(key)
+            if cached:
+                results[key] = cached
+            else:
+                pending[key] = data
+        
+        if pending:
+            self.upscale_routes['replicate_call'] += len(pending)
+            workers = max(1, min(self.replicate_concurrency, len(pending)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {key: executor.submit(self._predict_replicate, data) for key, data in pending.items()}
+                for key, future in futures.items():
+                    try:
+                        results[key] = future.result()
+                    except Exception as e:
+                        print(f"Error upscaling with Replicate: {e}")
+                        results[key] = None
+                    if results[key] and self.cache is not None:
+                        self.cache.store_result(key, results[key])
+        
+        return [results[key] for key in keys]
+    
     def _upscale_with_replicate(self, image_path: str) -> Optional[str]:
         """Upscale image using Replicate API"""
         try:
             # Using ESRGAN model on Replicate
-            output = replicate.run(
-                "nightmareai/real-esrgan:42fed1c4974146d4d2414e2be2c5277c7fcf05fcc3a73abf41610695738c1d7b",
-                input={"image": open(image_path, "rb")}
-            )
+            with open(image_path, "rb") as image_file:
+                upscaled_data = self._replicate_upscale_bytes(image_file.read())
             
             # Save upscaled image
-            output_path = image_path.replace('.jpg', '_upscaled.jpg')
+            output_path = self._track(image_path.replace('.jpg', '_upscaled.jpg'))
             
-            if isinstance(output, str):
-                response = requests.get(output)
+            if upscaled_data:
                 with open(output_path, 'wb') as f:
-                    f.write(response.content)
+                    f.write(upscaled_data)
                 
                 return output_path
             
@@ -81,16 +544,18 @@ class ImageProcessor:
             print(f"Error upscaling with Replicate: {e}")
             return image_path
     
+    def upscale_pil_image(self, img: Image.Image, scale_factor: int = 2) -> Image.Image:
+        """Upscale an in-memory image with LANCZOS"""
+        width, height = img.size
+        return img.resize((width * scale_factor, height * scale_factor), Image.LANCZOS)
+    
     def _upscale_with_pil(self, image_path: str, scale_factor: int) -> Optional[str]:
         """Upscale image using PIL (simple method)"""
         try:
             img = Image.open(image_path)
-            width, height = img.size
+            upscaled = self.upscale_pil_image(img, scale_factor)
             
-            new_size = (width * scale_factor, height * scale_factor)
-            upscaled = img.resize(new_size, Image.LANCZOS)
-            
-            output_path = image_path.replace('.jpg', '_upscaled.jpg')
+            output_path = self._track(image_path.replace('.jpg', '_upscaled.jpg'))
             upscaled.save(output_path, quality=95)
             
             return output_path
@@ -99,46 +564,470 @@ class ImageProcessor:
             print(f"Error upscaling with PIL: {e}")
             return image_path
     
+    def plan_resample(self, size: Tuple[int, int], target: Tuple[int, int] = None) -> Tuple[int, int]:
+        """
+        Size a source image must be resampled to so it fits the target canvas
+        (target_width x target_height unless another canvas size is given)
+        
+        One resample covers both cases: it upscales only when the source is
+        smaller than the target and downscales otherwise, so a separate PIL
+        upscale followed by a shrink is never needed.
+        """
+        width, height = size
+        target_w, target_h = target or (self.target_width, self.target_height)
+        
+        # Calculate resize that fits within target while maintaining ratio
+        ratio = min(target_w / width, target_h / height)
+        return max(1, int(width * ratio)), max(1, int(height * ratio))
+    
+    def open_image(self, source) -> Image.Image:
+        """
+        Open an image from a path or file object
+        Large JPEGs decode at a reduced DCT scale (1/2, 1/4, 1/8) when the
+        target canvas allows it, which cuts decode time and peak memory
+        """
+        img = Image.open(source)
+        # Drafting shrinks img.size; pass-through checks need the size of the stored bytes
+        img.info['header_size'] = img.size
+        if self.jpeg_draft and img.format == 'JPEG':
+            img.draft('RGB', self._draft_request(img, self._content_size(source, img)))
+        return img
+    
+    def _draft_request(self, img: Image.Image, content_size: Tuple[int, int],
+                       target: Tuple[int, int] = None) -> Tuple[int, int]:
+        """Full-image size to draft to so that the content region still covers its planned size"""
+        planned_w, planned_h = self.plan_resample(content_size, target)
+        scale = max(planned_w / content_size[0], planned_h / content_size[1])
+        return math.ceil(img.width * scale), math.ceil(img.height * scale)
+    
+    def _content_size(self, source, img: Image.Image) -> Tuple[int, int]:
+        """
+        Size of the region trim_whitespace will keep, estimated from a 1/8-scale
+        JPEG decode, so draft mode does not discard pixels the crop needs
+        """
+        if not self.trim:
+            return img.size
+        try:
+            if isinstance(source, str):
+                preview = Image.open(source)
+            elif isinstance(source, io.BytesIO):
+                preview = Image.open(io.BytesIO(source.getvalue()))
+            else:
+                return img.size
+            
+            preview.draft('RGB', (img.width // 8, img.height // 8))
+            box = self._trim_box(preview)
+            if not box:
+                return img.size
+            scale = img.width / preview.width
+            return math.ceil((box[2] - box[0]) * scale), math.ceil((box[3] - box[1]) * scale)
+        except Exception:
+            return img.size
+    
+    def _trim_box(self, img: Image.Image) -> Optional[Tuple[int, int, int, int]]:
+        """Content box plus trim_margin, or None when there is nothing to trim"""
+        bbox = content_bbox(img, self.trim_tolerance)
+        if not bbox:
+            return None
+        
+        left, top, right, bottom = bbox
+        margin = int(self.trim_margin * max(right - left, bottom - top))
+        box = (max(0, left - margin), max(0, top - margin),
+               min(img.width, right + margin), min(img.height, bottom + margin))
+        return None if box == (0, 0, img.width, img.height) else box
+    
+    def trim_whitespace(self, img: Image.Image) -> Image.Image:
+        """
+        Crop white margins around the product (keeping trim_margin of padding)
+        so it fills the canvas instead of being shrunk with its margins
+        Returns the same image object when nothing was trimmed
+        """
+        if not self.trim:
+            return img
+        box = self._trim_box(img)
+        return img.crop(box) if box else img
+    
+    def fit_to_canvas(self, img: Image.Image, target: Tuple[int, int] = None) -> Image.Image:
+        """
+        Fit an in-memory image into the white target canvas (2:3 by default)
+        Returns the image unchanged when it already has the target size
+        """
+        # Pinterest recommended aspect ratio: 2:3 (1000x1500)
+        target_w, target_h = target or (self.target_width, self.target_height)
+        
+        if img.size == (target_w, target_h):
+            return img
+        
+        new_w, new_h = self.plan_resample(img.size, (target_w, target_h))
+        
+        # Resize (at most once)
+        if (new_w, new_h) == img.size:
+            img_resized = img
+        else:
+            img_resized = img.resize((new_w, new_h), Image.LANCZOS, reducing_gap=self.reducing_gap)
+        
+        return self.pad_to_canvas(img_resized, (target_w, target_h))
+    
+    def pad_to_canvas(self, img: Image.Image, target: Tuple[int, int]) -> Image.Image:
+        """Paste an already resized image centered on a white canvas of the target size"""
+        # Create canvas with target dimensions and paste centered
+        target_w, target_h = target
+        canvas = Image.new('RGB', (target_w, target_h), (255, 255, 255))
+        x = (target_w - img.width) // 2
+        y = (target_h - img.height) // 2
+        canvas.paste(img, (x, y))
+        
+        return canvas
+    
+    def encode_image(self, img: Image.Image, output_path: str) -> str:
+        """
+        Final encode with the configured encoder (output_format: jpeg or webp)
+        
+        Uses output_quality unless a byte budget (max_output_kb) or an SSIM
+        floor (min_ssim) is set; then the quality is searched between
+        min_quality and output_quality: the lowest quality that keeps SSIM at
+        the floor, lowered further if needed to fit the budget (the budget
+        wins). The extension of output_path is replaced to match the format.
+        Bytes, quality and milliseconds are recorded in encode_stats.
+        """
+        start = time.perf_counter()
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        
+        if self.max_output_bytes or self.min_ssim:
+            quality, data, score, attempts = self._search_quality(img)
+        else:
+            quality, data, score, attempts = self.output_quality, self._encode(img, self.output_quality), None, 1
+        
+        output_path = self._track(os.path.splitext(output_path)[0] + self.output_ext)
+        with open(output_path, 'wb') as f:
+            f.write(data)
+        
+        self._record_encode(output_path, quality, len(data), (time.perf_counter() - start) * 1000,
+                            ssim=score, attempts=attempts)
+        return output_path
+    
+    def _encode(self, img: Image.Image, quality: int) -> bytes:
+        buffer = io.BytesIO()
+        if self.output_format == 'webp':
+            img.save(buffer, 'WEBP', quality=quality, method=self.webp_method)
+        else:
+            img.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=self.jpeg_progressive)
+        return buffer.getvalue()
+    
+    def _search_quality(self, img: Image.Image) -> Tuple[int, bytes, Optional[float], int]:
+        """Binary searches over quality; returns (quality, bytes, ssim, encodes)"""
+        encoded = {}
+        scores = {}
+        
+        def encode(quality):
+            if quality not in encoded:
+                encoded[quality] = self._encode(img, quality)
+            return encoded[quality]
+        
+        def score(quality):
+            if quality not in scores:
+                scores[quality] = ssim(img, Image.open(io.BytesIO(encode(quality))))
+            return scores[quality]
+        
+        def lowest(low, high, ok):
+            # Smallest quality in [low, high] with ok(quality); high if none
+            while low < high:
+                mid = (low + high) // 2
+                if ok(mid):
+                    high = mid
+                else:
+                    low = mid + 1
+            return high
+        
+        quality = self.output_quality
+        if self.min_ssim and np is not None:
+            quality = lowest(self.min_quality, quality, lambda q: score(q) >= self.min_ssim)
+        if self.max_output_bytes and len(encode(quality)) > self.max_output_bytes:
+            # Largest quality that fits: first quality (from the top) over budget, minus one
+            over = lowest(self.min_quality, quality, lambda q: len(encode(q)) > self.max_output_bytes)
+            quality = max(self.min_quality, over - 1)
+        
+        return quality, encode(quality), scores.get(quality), len(encoded)
+    
+    def _record_encode(self, path: str, quality: Optional[int], size: int, ms: float,
+                       ssim: float = None, attempts: int = 0):
+        stats = {'path': path, 'format': self.output_format, 'quality': quality, 'bytes': size,
+                 'ms': round(ms, 1), 'ssim': round(ssim, 4) if ssim is not None else None,
+                 'attempts': attempts}
+        self.encode_stats.append(stats)
+        if not attempts:
+            print(f"🗜️  Kept source JPEG {os.path.basename(path)}: {size / 1024:.0f} KB (already target size)")
+            return
+        print(f"🗜️  Encoded {os.path.basename(path)}: {size / 1024:.0f} KB "
+              f"({self.output_format} q{quality}, {attempts} encode(s)) in {ms:.0f} ms")
+    
+    def encode_metrics(self) -> Dict:
+        """Totals of the encodes done by this processor"""
+        count = len(self.encode_stats)
+        total_bytes = sum(stats['bytes'] for stats in self.encode_stats)
+        total_ms = sum(stats['ms'] for stats in self.encode_stats)
+        return {
+            'images': count,
+            'bytes': total_bytes,
+            'ms': round(total_ms, 1),
+            'avg_kb': round(total_bytes / count / 1024, 1) if count else 0,
+            'avg_ms': round(total_ms / count, 1) if count else 0
+        }
+    
+    def _encoder_tag(self) -> str:
+        """Short description of the encoder settings, part of cache variant names"""
+        tag = f"{self.output_format}{self.output_quality}"
+        if self.output_format != 'webp' and self.jpeg_progressive:
+            tag += 'p'
+        if self.max_output_bytes:
+            tag += f"b{self.max_output_bytes // 1024}"
+        if self.min_ssim:
+            tag += f"s{self.min_ssim}"
+        return tag
+    
+    def _can_pass_through(self, source: Image.Image, size: int) -> bool:
+        """
+        Whether source bytes can be kept without re-encoding: a JPEG stored at
+        exactly the target size (not one that only drafted down to it), JPEG output
+        """
+        stored_size = source.info.get('header_size', source.size)
+        return (self.output_format == 'jpeg' and source.format == 'JPEG'
+                and stored_size == (self.target_width, self.target_height)
+                and (not self.max_output_bytes or size <= self.max_output_bytes))
+    
     def optimize_for_pinterest(self, image_path: str) -> Optional[str]:
         """
         Optimize image for Pinterest (2:3 aspect ratio recommended)
         Target: 1000x1500px
         """
         try:
-            img = Image.open(image_path)
-            width, height = img.size
-            
-            # Pinterest recommended aspect ratio: 2:3 (1000x1500)
-            target_w, target_h = self.target_width, self.target_height
+            source = self.open_image(image_path)
+            img = self.trim_whitespace(source)
             
             # Resize maintaining aspect ratio
-            if width != target_w or height != target_h:
-                # Calculate resize that fits within target while maintaining ratio
-                ratio = min(target_w / width, target_h / height)
-                new_w = int(width * ratio)
-                new_h = int(height * ratio)
-                
-                # Resize
-                img_resized = img.resize((new_w, new_h), Image.LANCZOS)
-                
-                # Create canvas with target dimensions and paste centered
-                canvas = Image.new('RGB', (target_w, target_h), (255, 255, 255))
-                x = (target_w - new_w) // 2
-                y = (target_h - new_h) // 2
-                canvas.paste(img_resized, (x, y))
+            if img is not source or img.size != (self.target_width, self.target_height):
+                canvas = self.fit_to_canvas(img)
                 
                 # Save optimized image
                 output_path = image_path.replace('.jpg', '_pinterest_optimized.jpg')
-                canvas.save(output_path, quality=95, optimize=True)
-                
-                return output_path
+                return self.encode_image(canvas, output_path)
             
+            if not self._can_pass_through(source, os.path.getsize(image_path)):
+                return self.encode_image(img, image_path.replace('.jpg', '_pinterest_optimized.jpg'))
             return image_path
             
         except Exception as e:
             print(f"Error optimizing for Pinterest: {e}")
             return image_path
     
+    def render_variants(self, image, specs: Dict[str, Tuple[int, int]] = None,
+                        output_prefix: str = None) -> Dict[str, Optional[str]]:
+        """
+        Render several canvas sizes of one image (default: PIN_FORMATS)
+        
+        image is a path, bytes, file object or PIL image. The source is decoded
+        once (JPEG draft scale chosen for the largest variant). Each distinct
+        planned size is resampled once from that image, starting from a shared
+        integer box reduction when the source is 2x or more larger, so formats
+        with the same fit (standard and square for wide images) share the work.
+        Canvases are then padded and encoded in parallel threads.
+        Writes <output_prefix>_<name>.jpg (prefix defaults to the source path
+        without extension) and returns {name: path or None on failure}.
+        """
+        specs = specs or PIN_FORMATS
+        
+        if isinstance(image, Image.Image):
+            img, source = image, None
+        else:
+            if isinstance(image, str):
+                output_prefix = output_prefix or os.path.splitext(image)[0]
+            source = io.BytesIO(image) if isinstance(image, bytes) else image
+            img = Image.open(source)
+        
+        if not output_prefix:
+            raise ValueError("output_prefix is required when the image is not a file path")
+        
+        if self.jpeg_draft and img.format == 'JPEG':
+            # Planned sizes keep the source aspect ratio, so the widest is the largest
+            content_size = self._content_size(source, img)
+            largest = max((self._draft_request(img, content_size, size) for size in specs.values()),
+                          key=lambda s: s[0])
+            img.draft('RGB', largest)
+        
+        img.load()
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        img = self.trim_whitespace(img)
+        
+        reduced = {1: img}
+        resized = {}
+        for size in specs.values():
+            planned = self.plan_resample(img.size, tuple(size))
+            if planned in resized:
+                continue
+            factor = max(1, min(img.width // planned[0], img.height // planned[1]))
+            if factor not in reduced:
+                reduced[factor] = img.reduce(factor)
+            base = reduced[factor]
+            resized[planned] = base if base.size == planned else base.resize(
+                planned, Image.LANCZOS, reducing_gap=self.reducing_gap)
+        
+        def render(name: str, size: Tuple[int, int]) -> Optional[str]:
+            try:
+                base = resized[self.plan_resample(img.size, size)]
+                canvas = base if base.size == size else self.pad_to_canvas(base, size)
+                return self.encode_image(canvas, f"{output_prefix}_{name}{self.output_ext}")
+            except Exception as e:
+                print(f"Error rendering {name} variant: {e}")
+                return None
+        
+        with ThreadPoolExecutor(max_workers=len(specs)) as executor:
+            futures = {name: executor.submit(render, name, tuple(size)) for name, size in specs.items()}
+            return {name: future.result() for name, future in futures.items()}
+    
+    def process_image_in_memory(self, url: str, image_data: bytes, output_path: str,
+                                upscale: bool = True) -> Optional[str]:
+        """
+        Upscale and fit a downloaded image without intermediate files
+        The decoded image flows through every step and is encoded once at the end
+        upscale=False skips the Replicate step (image_data is already upscaled)
+        """
+        # Routed on the header size of the whole frame, like upscale_image and
+        # _upscale_downloads (trimming must not send covering images to Replicate)
+        route = None
+        if upscale and self.upscale_method == 'replicate':
+            with Image.open(io.BytesIO(image_data)) as header:
+                route = self.route_upscale(header.size)
+        
+        source = self.open_image(io.BytesIO(image_data))
+        img = self.trim_whitespace(source)
+        
+        if route == 'replicate':
+            upscaled_data = self._replicate_upscale_bytes(image_data)
+            if upscaled_data:
+                source = self.open_image(io.BytesIO(upscaled_data))
+                img = self.trim_whitespace(source)
+                image_data = upscaled_data
+        # 'pil' needs no separate step: fit_to_canvas upscales in its single resample
+        
+        canvas = self.fit_to_canvas(img)
+        if canvas is source and self._can_pass_through(source, len(image_data)):
+            # Already the target size: keep the source bytes, no re-encode at all
+            with open(output_path, 'wb') as f:
+                f.write(image_data)
+            self._record_encode(output_path, None, len(image_data), 0)
+            return output_path
+        
+        return self.encode_image(canvas, output_path)
+    
+    def _replicate_upscale_bytes(self, image_data: bytes) -> Optional[bytes]:
+        """Replicate upscale of in-memory bytes, reusing the cached result for this content"""
+        key = self._replicate_cache_key(image_data)
+        cached = self._cached_replicate_result(key)
+        if cached:
+            return cached
+        
+        try:
+            upscaled_data = self._run_replicate(io.BytesIO(image_data))
+        except Exception as e:
+            print(f"Error upscaling with Replicate: {e}")
+            return None
+        
+        if upscaled_data and self.cache is not None:
+            self.cache.store_result(key, upscaled_data)
+        return upscaled_data
+    
+    def _upscale_downloads(self, downloads: List[Optional[bytes]]) -> List[Optional[bytes]]:
+        """Route downloaded images and upscale the undersized ones in one concurrent Replicate batch"""
+        selected = []
+        for i, image_data in enumerate(downloads):
+            if not image_data:
+                continue
+            try:
+                with Image.open(io.BytesIO(image_data)) as img:
+                    if self.route_upscale(img.size) == 'replicate':
+                        selected.append(i)
+            except Exception:
+                # Undecodable: left for the worker to report
+                continue
+        
+        downloads = list(downloads)
+        upscaled = self.upscale_replicate_batch([downloads[i] for i in selected])
+        for i, upscaled_data in zip(selected, upscaled):
+            if upscaled_data:
+                downloads[i] = upscaled_data
+        return downloads
+    
+    @property
+    def hash_index(self) -> ImageHashIndex:
+        """Perceptual hashes of processed images, stored next to the image cache"""
+        if self._hash_index is None:
+            cache_dir = self.config.get('image_processing', {}).get('cache_dir', '.image_cache')
+            os.makedirs(cache_dir, exist_ok=True)
+            self._hash_index = ImageHashIndex(os.path.join(cache_dir, f"{self.dedupe_hash}.index"))
+        return self._hash_index
+    
+    def fingerprint(self, image_data: bytes) -> Optional[int]:
+        """
+        Perceptual hash (dedupe_hash: phash or dhash) of downloaded image bytes
+        Computed on a small draft decode after whitespace trimming, so the same
+        product shot with different margins, size or compression matches
+        """
+        try:
+            preview = Image.open(io.BytesIO(image_data))
+            if preview.format == 'JPEG':
+                preview.draft('L', (128, 128))
+            preview = self.trim_whitespace(preview.convert('L'))
+            return phash(preview) if self.dedupe_hash == 'phash' else dhash(preview)
+        except Exception as e:
+            print(f"Error hashing image: {e}")
+            return None
+    
+    def find_duplicate(self, url: str, fingerprint: Optional[int]) -> Optional[str]:
+        """URL of an already processed near-duplicate image (within dedupe_distance bits)"""
+        if not self.dedupe or fingerprint is None:
+            return None
+        match = self.hash_index.find(fingerprint, self.dedupe_distance, exclude=url)
+        if not match:
+            return None
+        self.duplicates[url] = match[1]
+        return match[1]
+    
+    def _reuse_duplicate(self, url: str, duplicate_url: str, output_path: str) -> Optional[str]:
+        """Copy the cached final image of a near-duplicate instead of processing again"""
+        if self.cache is None:
+            return None
+        cached_path = self.cache.variant_path(duplicate_url, self._optimized_variant())
+        if not cached_path:
+            return None
+        shutil.copyfile(cached_path, output_path)
+        self.cache.store_variant(url, self._optimized_variant(), output_path)
+        return output_path
+    
+    def _dedupe_before_processing(self, url: str, image_data: bytes, output_path: str) -> Tuple[Optional[int], Optional[str]]:
+        """
+        Fingerprint a download and look for a near-duplicate
+        Returns (fingerprint, reused output path or None)
+        """
+        if not self.dedupe:
+            return None, None
+        fingerprint = self.fingerprint(image_data)
+        duplicate_url = self.find_duplicate(url, fingerprint)
+        if not duplicate_url:
+            return fingerprint, None
+        
+        reused = self._reuse_duplicate(url, duplicate_url, output_path)
+        if reused:
+            print(f"♻️  Near-duplicate of {duplicate_url}: reusing its optimized image")
+        else:
+            print(f"⚠️  Near-duplicate of {duplicate_url} (no cached result, processing anyway)")
+        return fingerprint, reused
+    
+    def _remember_fingerprint(self, url: str, fingerprint: Optional[int], save: bool = True):
+        if self.dedupe and fingerprint is not None:
+            self.hash_index.add(url, fingerprint, save)
+    
     def process_product_images(self, image_urls: List[str], product_title: str) -> Optional[str]:
         """
         Download, upscale if needed, and optimize product images for Pinterest
@@ -148,20 +1037,63 @@ class ImageProcessor:
             return None
         
         try:
+            url = self.resolve_image_url(image_urls)
+            if not url:
+                print("No usable product image")
+                return None
+            temp_path = self._temp_path(product_title)
+            optimized_variant = self._optimized_variant()
+            
+            # Repeat products: reuse the final image without download or re-encode
+            cached_final = self._cached_variant(url, optimized_variant,
+                                                self._optimized_path(temp_path))
+            if cached_final:
+                return cached_final
+            
+            if self.in_memory:
+                image_data = self.download_image(url)
+                if not image_data:
+                    return None
+                
+                # Near-duplicates of processed images skip upscaling and optimizing
+                fingerprint, reused = self._dedupe_before_processing(
+                    url, image_data, self._optimized_path(temp_path))
+                if reused:
+                    return reused
+                
+                final_image = self.process_image_in_memory(
+                    url, image_data, self._optimized_path(temp_path))
+                if final_image and self.cache is not None:
+                    self.cache.store_variant(url, optimized_variant, final_image)
+                if final_image:
+                    self._remember_fingerprint(url, fingerprint)
+                return final_image
+            
+            # Temp-file chain (image_processing.in_memory = false)
             # Download first image
-            temp_path = f"temp_{product_title.replace(' ', '_')}_image.jpg"
-            downloaded = self.download_image(image_urls[0], temp_path)
+            downloaded = self.download_image(url, temp_path)
             
             if not downloaded:
                 return None
             
-            # Upscale if needed
-            upscaled_path = self.upscale_image(downloaded)
-            if not upscaled_path:
-                upscaled_path = downloaded
+            with open(downloaded, 'rb') as f:
+                fingerprint, reused = self._dedupe_before_processing(
+                    url, f.read(), self._optimized_path(temp_path))
+            if reused:
+                return reused
+            
+            # Upscale if needed ('pil' is folded into the single resize below,
+            # Replicate results are cached by source content)
+            upscaled_path = downloaded
+            if self.upscale_method != 'pil':
+                upscaled_path = self.upscale_image(downloaded) or downloaded
             
             # Optimize for Pinterest
             final_image = self.optimize_for_pinterest(upscaled_path)
+            if final_image and final_image != upscaled_path and self.cache is not None:
+                self.cache.store_variant(url, optimized_variant, final_image)
+            if final_image:
+                self._remember_fingerprint(url, fingerprint)
             
             return final_image if final_image else upscaled_path
             
@@ -169,8 +1101,149 @@ class ImageProcessor:
             print(f"Error processing product images: {e}")
             return None
     
+    def process_batch(self, products: List[Dict], workers: int = None) -> List[Dict]:
+        """
+        Optimize images for many products, with resizing and encoding in a process pool
+        
+        Downloads overlap in threads in this process; decode/resize/encode runs
+        in `workers` processes. Returns one result per product, in input order:
+        {'title', 'image' (path or None), 'error' (message or None),
+        'duplicate_of' (URL of a near-duplicate image or None)}.
+        A failing product never aborts the rest of the batch. Near-duplicates of
+        earlier images (in the index or in this batch) reuse their result.
+        """
+        workers = workers or self.batch_workers
+        results = [{'title': p.get('title', ''), 'image': None, 'error': None, 'duplicate_of': None}
+                   for p in products]
+        with ThreadPoolExecutor(max_workers=max(1, self.download_workers)) as executor:
+            urls = list(executor.map(self.resolve_image_url, [_product_image_urls(p) for p in products]))
+            output_paths = [self._optimized_path(self._temp_path(product.get('title', f'product_{i}')))
+                            if url else None for i, (product, url) in enumerate(zip(products, urls))]
+            # The cache check downloads (or revalidates) uncached sources, so it runs
+            # in the pool too; download_images below then reads them from the cache
+            variant = self._optimized_variant()
+            cached = list(executor.map(
+                lambda url, path: self._cached_variant(url, variant, path) if url else None,
+                urls, output_paths))
+        
+        pending = []
+        for i, (url, output_path) in enumerate(zip(urls, output_paths)):
+            if not url:
+                results[i]['error'] = 'no image'
+            elif cached[i]:
+                results[i]['image'] = cached[i]
+            else:
+                pending.append((i, url, output_path))
+        
+        if not pending:
+            return results
+        
+        downloads = self.download_images([url for _, url, _ in pending])
+        
+        # Near-duplicates: reuse cached results, or the first copy within this batch
+        work = []
+        fingerprints = {}
+        batch_hashes = BKTree()
+        copies = {}
+        for (i, url, output_path), image_data in zip(pending, downloads):
+            if not image_data:
+                results[i]['error'] = 'download failed'
+                continue
+            fingerprint, reused = self._dedupe_before_processing(url, image_data, output_path)
+            results[i]['duplicate_of'] = self.duplicates.get(url)
+            if reused:
+                results[i]['image'] = reused
+                continue
+            if fingerprint is not None:
+                match = batch_hashes.find(fingerprint, self.dedupe_distance)
+                if match:
+                    copies[i] = match[0][1]
+                    results[i]['duplicate_of'] = urls[match[0][1]]
+                    continue
+                batch_hashes.add(fingerprint, i)
+                fingerprints[i] = fingerprint
+            work.append((i, url, output_path, image_data))
+        
+        if self.upscale_method == 'replicate':
+            upscaled = self._upscale_downloads([image_data for _, _, _, image_data in work])
+            work = [(i, url, output_path, image_data) for (i, url, output_path, _), image_data in zip(work, upscaled)]
+        
+        if work:
+            with ProcessPoolExecutor(max_workers=max(1, min(workers, len(work))),
+                                     initializer=_init_batch_worker, initargs=(self.config,)) as executor:
+                futures = {}
+                for i, url, output_path, image_data in work:
+                    futures[i] = (url, executor.submit(_process_batch_item, url, image_data, output_path,
+                                                                self.upscale_method != 'replicate'))
+                
+                for i, (url, future) in futures.items():
+                    try:
+                        results[i]['image'], routes, encodes = future.result()
+                        self.upscale_routes.update(routes)
+                        self.encode_stats.extend(encodes)
+                        if self.cache is not None:
+                            self.cache.store_variant(url, self._optimized_variant(), results[i]['image'])
+                        self._remember_fingerprint(url, fingerprints.get(i), save=False)
+                    except Exception as e:
+                        results[i]['error'] = str(e)
+                        print(f"Error processing image for {results[i]['title']}: {e}")
+        
+        for j, i in copies.items():
+            if not results[i]['image']:
+                results[j]['error'] = results[i]['error']
+                continue
+            output_path = next(path for k, _, path in pending if k == j)
+            shutil.copyfile(results[i]['image'], output_path)
+            results[j]['image'] = output_path
+            if self.cache is not None:
+                self.cache.store_variant(urls[j], self._optimized_variant(), output_path)
+        
+        if self.dedupe and fingerprints:
+            self.hash_index.save()
+        return results
+    
+    def _temp_path(self, product_title: str) -> str:
+        """Unique download path in the workspace (same titles never collide)"""
+        if self.workspace is None:
+            self.workspace = Workspace.from_config(self.config)
+        return self.workspace.file_path(f"temp_{product_title}")
+    
+    def _optimized_path(self, temp_path: str) -> str:
+        return self._track(f"{os.path.splitext(temp_path)[0]}_pinterest_optimized{self.output_ext}")
+    
+    def _track(self, path: Optional[str]) -> Optional[str]:
+        """Register a written file with the workspace so cleanup removes it"""
+        if self.workspace is not None:
+            self.workspace.track(path)
+        return path
+    
+    def _optimized_variant(self) -> str:
+        """Cache variant name of the final Pinterest image for the current settings"""
+        trim_tag = f"trim{self.trim_tolerance}m{self.trim_margin}" if self.trim else 'notrim'
+        return (f"pinterest_optimized_{self.upscale_method}_{self.target_width}x{self.target_height}"
+                f"_{trim_tag}_{self._encoder_tag()}")
+    
+    def _cached_variant(self, url: str, variant: str, dest_path: str) -> Optional[str]:
+        """Copy a cached derived image to dest_path if the source image is still current"""
+        if self.cache is None:
+            return None
+        try:
+            # Revalidates the source when its TTL expired; drops outdated variants
+            self.cache.fetch(url, self.session, self.download_timeout, self.max_download_bytes)
+            cached_path = self.cache.variant_path(url, variant)
+            if not cached_path:
+                return None
+            shutil.copyfile(cached_path, dest_path)
+            return dest_path
+        except Exception as e:
+            print(f"Error reading image cache: {e}")
+            return None
+    
     def cleanup_temp_files(self, *file_paths):
-        """Clean up temporary files"""
+        """Clean up temporary files (all workspace artifacts if no paths are given)"""
+        if not file_paths and self.workspace is not None:
+            self.workspace.cleanup()
+            return
         for path in file_paths:
             try:
                 if os.path.exists(path):
@@ -179,15 +1252,66 @@ class ImageProcessor:
                 print(f"Error cleaning up file {path}: {e}")
 
 
-def optimize_image_for_pin(image_url: str, product_title: str, config: dict) -> Optional[str]:
+def _product_image_urls(product: Dict) -> List[str]:
+    """Candidate image URLs of an Amazon search result or catalog product"""
+    return product.get('images') or [product.get('image_url')]
+
+
+# Per-process ImageProcessor for process_batch workers (built once per worker)
+_batch_processor = None
+
+def _init_batch_worker(config: dict):
+    global _batch_processor
+    _batch_processor = ImageProcessor(config)
+
+def _process_batch_item(url: str, image_data: bytes, output_path: str, upscale: bool) -> Tuple[str, Counter, List[Dict]]:
+    """Process one image in a worker; returns the output path, upscale routing counts and encode stats"""
+    _batch_processor.upscale_routes.clear()
+    _batch_processor.encode_stats.clear()
+    output = _batch_processor.process_image_in_memory(url, image_data, output_path, upscale)
+    return output, Counter(_batch_processor.upscale_routes), list(_batch_processor.encode_stats)
+
+
+def optimize_image_for_pin(image_url: str, product_title: str, config: dict,
+                           workspace: Workspace = None) -> Optional[str]:
     """
     Main function to optimize an image for Pinterest pin
     """
-    processor = ImageProcessor(config)
+    processor = ImageProcessor(config, workspace=workspace)
     final_image = processor.process_product_images([image_url], product_title)
     return final_image
 
 
+def optimize_best_image_for_pin(image_urls: List[str], product_title: str, config: dict,
+                                workspace: Workspace = None) -> Optional[str]:
+    """
+    Optimize the best of several product images for a Pinterest pin
+    Candidates are compared by probing headers; only the chosen one is downloaded
+    Files are written into `workspace` (the caller cleans it up after posting)
+    """
+    processor = ImageProcessor(config, workspace=workspace)
+    return processor.process_product_images(image_urls, product_title)
+
+
+def render_pin_variants(image_path: str, config: dict, specs: Dict[str, Tuple[int, int]] = None) -> Dict[str, Optional[str]]:
+    """
+    Render every Pinterest format of an image from a single decode
+    See ImageProcessor.render_variants
+    """
+    processor = ImageProcessor(config)
+    return processor.render_variants(image_path, specs)
+
+
+def optimize_images_for_pins(products: List[Dict], config: dict, workers: int = None,
+                             workspace: Workspace = None) -> List[Dict]:
+    """
+    Optimize images for a batch of products in parallel
+    Results are in input order; see ImageProcessor.process_batch
+    """
+    processor = ImageProcessor(config, workspace=workspace)
+    return processor.process_batch(products, workers)
+
+
 if __name__ == "__main__":
     import json
     
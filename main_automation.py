@@ -12,12 +12,13 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 
 from pinterest_research import get_trending_products_on_pinterest
-from amazon_search import search_amazon_product
-from image_processor import optimize_image_for_pin
+from amazon_search import AmazonProductSearch, search_amazon_product
+from image_processor import optimize_best_image_for_pin
 from pin_creator import prepare_pin_for_creation
-from database import save_product, get_recently_posted
+from database import save_product, get_recently_posted, has_ever_posted
 from scheduler import get_next_posting_time, is_time_to_post
 from mcp_integration import create_pinterest_pin_via_mcp
+from workspace import Workspace
 
 
 class PinterestAmazonAutomation:
@@ -29,6 +30,8 @@ class PinterestAmazonAutomation:
         self.posts_today = 0
         self.max_posts_per_day = self.config.get('automation', {}).get('pins_per_day', 3)
         self.include_fallback = self.config.get('automation', {}).get('include_fallback', True)
+        self.never_repost = self.config.get('automation', {}).get('never_repost', False)
+        self.max_alternatives = self.config.get('automation', {}).get('max_alternatives', 5)
         
     def research_and_post_cycle(self) -> bool:
         """
@@ -64,41 +67,47 @@ class PinterestAmazonAutomation:
                     print("🔄 Trying fallback product...")
                     amazon_product = self._find_amazon_product(selected_product, fallback_rank=1)
             
+            if amazon_product and self.never_repost and has_ever_posted(amazon_product.get('asin')):
+                print("⏭️  Product was already posted before, trying alternative products...")
+                amazon_product = self._find_unposted_alternative(selected_product)
+            
             if not amazon_product:
                 print("❌ Could not find product on Amazon")
                 return False
             
             print(f"✅ Found: {amazon_product['title']} - ${amazon_product.get('price', 0)}")
             
-            # Step 4: Process images
-            print("\n🖼️  Step 3: Processing and optimizing images...")
-            images = amazon_product.get('images', [])
-            if not images:
-                print("❌ No images available")
-                return False
-            
-            optimized_image = self._process_product_image(images[0], amazon_product['title'])
-            if not optimized_image:
-                print("❌ Image processing failed")
-                return False
-            
-            print(f"✅ Image ready: {optimized_image}")
-            
-            # Step 5: Create Pinterest pin
-            print("\n📌 Step 4: Creating Pinterest pin...")
-            success = self._create_pinterest_pin(amazon_product, optimized_image)
-            
-            if success:
-                print("\n🎉 SUCCESS: Pin created and scheduled!")
-                self.posts_today += 1
+            # Steps 4-5 write into a per-cycle workspace, removed once the pin is posted (or on failure)
+            with Workspace.from_config(self.config) as workspace:
+                # Step 4: Process images
+                print("\n🖼️  Step 3: Processing and optimizing images...")
+                images = amazon_product.get('images', [])
+                if not images:
+                    print("❌ No images available")
+                    return False
                 
-                # Save to database
-                save_product(amazon_product, selected_product, success)
+                optimized_image = self._process_product_image(images, amazon_product['title'], workspace)
+                if not optimized_image:
+                    print("❌ Image processing failed")
+                    return False
                 
-                return True
-            else:
-                print("\n❌ Failed to create pin")
-                return False
+                print(f"✅ Image ready: {optimized_image}")
+                
+                # Step 5: Create Pinterest pin
+                print("\n📌 Step 4: Creating Pinterest pin...")
+                success = self._create_pinterest_pin(amazon_product, optimized_image)
+                
+                if success:
+                    print("\n🎉 SUCCESS: Pin created and scheduled!")
+                    self.posts_today += 1
+                
+                    # Save to database
+                    save_product(amazon_product, selected_product, success)
+                
+                    return True
+                else:
+                    print("\n❌ Failed to create pin")
+                    return False
                 
         except Exception as e:
             print(f"\n❌ Error in automation cycle: {e}")
@@ -127,9 +136,27 @@ class PinterestAmazonAutomation:
         query = pinterest_product.get('suggested_product') or pinterest_product.get('keyword', '')
         return search_amazon_product(query, self.config, fallback_rank)
     
-    def _process_product_image(self, image_url: str, product_title: str) -> Optional[str]:
-        """Process and optimize product image"""
-        return optimize_image_for_pin(image_url, product_title, self.config)
+    def _find_unposted_alternative(self, pinterest_product: Dict) -> Optional[Dict]:
+        """
+        Alternative Amazon products (skipping the primary search, which returns
+        the already posted one) until one was never posted before
+        """
+        query = pinterest_product.get('suggested_product') or pinterest_product.get('keyword', '')
+        searcher = AmazonProductSearch(self.config)
+        tried = set()
+        for ranking in range(self.max_alternatives):
+            product = searcher.find_alternative_product(query, ranking)
+            if not product or product.get('asin') in tried:
+                continue
+            tried.add(product.get('asin'))
+            if not has_ever_posted(product.get('asin')):
+                return product
+        return None
+    
+    def _process_product_image(self, image_urls: List[str], product_title: str,
+                               workspace: Workspace = None) -> Optional[str]:
+        """Process and optimize the best of the product images"""
+        return optimize_best_image_for_pin(image_urls, product_title, self.config, workspace)
     
     def _create_pinterest_pin(self, product: Dict, image_path: str) -> bool:
         """
@@ -0,0 +1,163 @@
+"""
+PA-API Replay Server
+Local stand-in for the Product Advertising API that serves recorded responses,
+so AmazonProductSearch can be exercised offline
+
+Record real responses by setting "record_responses": "paapi_recordings.json"
+in the amazon config, then replay them:
+
+    python paapi_replay.py paapi_recordings.json --port 8766
+
+and point the client at it with "endpoint": "http://127.0.0.1:8766".
+Recordings are {"SearchItems": {"<keywords>|<page>": response},
+"GetItems": {"<ASIN>": item}}; GetItems responses are assembled per ASIN, so
+any batch of recorded ASINs can be served.
+"""
+
+import argparse
+import json
+import re
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+from amazon_search import sign_paapi_request
+
+
+AUTHORIZATION = re.compile(
+    r'^AWS4-HMAC-SHA256 Credential=(?P<key>[^/]+)/(?P<date>\d{8})/(?P<region>[^/]+)/[^/]+/aws4_request, '
+    r'SignedHeaders=(?P<signed>[^,]+), Signature=(?P<signature>[0-9a-f]{64})$')
+
+
+class PAAPIReplayServer(ThreadingHTTPServer):
+    """
+    HTTP server answering /paapi5/searchitems and /paapi5/getitems from recordings
+    If secret_key is given, request signatures are verified like the real API does
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], recordings: Dict, secret_key: str = None):
+        super().__init__(address, PAAPIReplayHandler)
+        self.recordings = recordings
+        self.secret_key = secret_key
+        self.request_count = 0
+
+    @classmethod
+    def from_file(cls, path: str, port: int = 0, secret_key: str = None) -> 'PAAPIReplayServer':
+        with open(path, 'r') as f:
+            return cls(('127.0.0.1', port), json.load(f), secret_key)
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class PAAPIReplayHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.server.request_count += 1
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+        operation = self.headers.get('x-amz-target', '').rsplit('.', 1)[-1]
+
+        error = self._check_signature(operation, body)
+        if error:
+            return self._send(401, _errors(*error))
+        if self.path != f"/paapi5/{operation.lower()}" or operation not in ('SearchItems', 'GetItems'):
+            return self._send(400, _errors('UnrecognizedClient', f"Unknown operation {operation or self.path}"))
+
+        try:
+            request = json.loads(body)
+        except ValueError:
+            return self._send(400, _errors('InvalidParameterValue', 'Request body is not JSON'))
+
+        if operation == 'SearchItems':
+            self._send(*self._search_items(request))
+        else:
+            self._send(*self._get_items(request))
+
+    def _check_signature(self, operation: str, body: str) -> Optional[Tuple[str, str]]:
+        match = AUTHORIZATION.match(self.headers.get('Authorization', ''))
+        if not match:
+            return 'IncompleteSignature', 'Missing or malformed Authorization header'
+        if not self.server.secret_key:
+            return None
+
+        expected = sign_paapi_request(operation, self.headers.get('Host', ''), self.path, body,
+                                      match.group('key'), self.server.secret_key, match.group('region'),
+                                      self.headers.get('x-amz-date', ''))
+        if expected['Authorization'] != self.headers['Authorization']:
+            return 'InvalidSignature', 'The request signature does not match'
+        return None
+
+    def _search_items(self, request: Dict) -> Tuple[int, Dict]:
+        key = f"{request.get('Keywords', '').strip().lower()}|{request.get('ItemPage', 1)}"
+        response = self.server.recordings.get('SearchItems', {}).get(key)
+        if response is None:
+            return 404, _errors('NoResults', f"No recorded results for {key}")
+        return 200, response
+
+    def _get_items(self, request: Dict) -> Tuple[int, Dict]:
+        asins = request.get('ItemIds', [])
+        if not asins or len(asins) > 10:
+            return 400, _errors('InvalidParameterValue', 'ItemIds must contain 1 to 10 ASINs')
+
+        recorded = self.server.recordings.get('GetItems', {})
+        items = [recorded[asin] for asin in asins if asin in recorded]
+        missing = [asin for asin in asins if asin not in recorded]
+        if not items:
+            return 404, _errors('ItemNotAccessible', f"No recorded items for {', '.join(asins)}")
+
+        response = {'ItemsResult': {'Items': items}}
+        if missing:
+            response.update(_errors('ItemNotAccessible', f"The ItemIds {', '.join(missing)} are not accessible"))
+        return 200, response
+
+    def _send(self, status: int, payload: Dict):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _errors(code: str, message: str) -> Dict:
+    return {'Errors': [{'Code': code, 'Message': message}]}
+
+
+@contextmanager
+def replay_server(recordings_path: str, secret_key: str = None):
+    """Run a PAAPIReplayServer on a free port for the duration of the block"""
+    server = PAAPIReplayServer.from_file(recordings_path, secret_key=secret_key)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('recordings', help='JSON file written with amazon.record_responses')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--secret-key', help='Verify request signatures with this secret key')
+    args = parser.parse_args()
+
+    server = PAAPIReplayServer.from_file(args.recordings, args.port, args.secret_key)
+    print(f"🔁 Replaying PA-API responses from {args.recordings} on {server.endpoint}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
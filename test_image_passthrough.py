@@ -0,0 +1,122 @@
+"""
+Pass-Through Checks
+Source bytes are kept unchanged only for JPEGs stored at exactly the target size
+
+    python -m pytest test_image_passthrough.py
+    python test_image_passthrough.py
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image, ImageDraw
+
+from image_processor import ImageProcessor
+from workspace import Workspace
+
+
+TARGET = (1000, 1500)
+
+
+def _photo(size, fmt='JPEG') -> bytes:
+    """Product-like test image (no white margins, so trimming keeps the frame)"""
+    img = Image.new('RGB', size, (30, 90, 160))
+    ImageDraw.Draw(img).ellipse((size[0] // 4, size[1] // 4, size[0] * 3 // 4, size[1] * 3 // 4),
+                                fill=(220, 180, 40))
+    buffer = io.BytesIO()
+    img.save(buffer, fmt, quality=95)
+    return buffer.getvalue()
+
+
+class _BytesHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        data = self.server.files.get(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@contextmanager
+def _serve(files):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _BytesHandler)
+    server.files = files
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@contextmanager
+def _processor(**settings):
+    work_dir = tempfile.mkdtemp(prefix='passthrough_')
+    config = {'image_processing': dict({
+        'upscale_using': 'none', 'cache_enabled': False, 'dedupe_images': False,
+        'batch_workers': 1}, **settings)}
+    try:
+        yield ImageProcessor(config, workspace=Workspace(work_dir)), work_dir
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _size(path):
+    with Image.open(path) as img:
+        return img.size, img.format
+
+
+def test_double_size_jpeg_is_resized_in_memory():
+    with _processor() as (processor, work_dir):
+        out = processor.process_image_in_memory('u', _photo((2000, 3000)),
+                                                os.path.join(work_dir, 'out.jpg'))
+        assert _size(out) == (TARGET, 'JPEG')
+
+
+def test_double_size_jpeg_is_resized_by_temp_file_chain():
+    with _processor() as (processor, work_dir):
+        path = os.path.join(work_dir, 'source.jpg')
+        with open(path, 'wb') as f:
+            f.write(_photo((2000, 3000)))
+        assert _size(processor.optimize_for_pinterest(path)) == (TARGET, 'JPEG')
+
+
+def test_double_size_jpeg_is_resized_by_product_and_batch_paths():
+    with _serve({'/big.jpg': _photo((2000, 3000))}) as base_url:
+        with _processor() as (processor, _):
+            assert _size(processor.process_product_images([base_url + '/big.jpg'], 'Big')) == (TARGET, 'JPEG')
+            result = processor.process_batch([{'title': 'Big', 'image_url': base_url + '/big.jpg'}])[0]
+            assert _size(result['image']) == (TARGET, 'JPEG')
+
+
+def test_exact_size_jpeg_keeps_source_bytes():
+    source = _photo(TARGET)
+    with _processor() as (processor, work_dir):
+        out = processor.process_image_in_memory('u', source, os.path.join(work_dir, 'out.jpg'))
+        with open(out, 'rb') as f:
+            assert f.read() == source
+
+
+def test_exact_size_png_is_encoded_as_jpeg():
+    with _processor(trim_whitespace=False) as (processor, work_dir):
+        out = processor.process_image_in_memory('u', _photo(TARGET, 'PNG'),
+                                                os.path.join(work_dir, 'out.jpg'))
+        assert _size(out) == (TARGET, 'JPEG')
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith('test_'):
+            check()
+            print(f"✅ {name}")
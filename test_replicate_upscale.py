@@ -0,0 +1,173 @@
+"""
+Replicate Upscale Cache and Batch Checks
+Runs ImageProcessor's Replicate paths against a local stand-in client, offline
+
+    python -m pytest test_replicate_upscale.py
+    python test_replicate_upscale.py
+"""
+
+import io
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+from image_processor import ImageProcessor
+
+
+class _OutputHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        data = self.server.outputs.get(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StubPrediction:
+    def __init__(self, client, image):
+        self._client = client
+        self._image = image
+        self.status = 'starting'
+        self.output = None
+        self.error = None
+
+    def wait(self):
+        try:
+            self.output = self._client._upscale(self._image)
+            self.status = 'succeeded'
+        except Exception as e:
+            self.status = 'failed'
+            self.error = str(e)
+
+
+class StubPredictions:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, version, input):
+        self._client.versions.append(version)
+        return StubPrediction(self._client, input['image'])
+
+
+class StubReplicate:
+    """
+    Stand-in for the replicate module: run() and predictions.create()
+    "Upscale" 2x with PIL after `latency` seconds and return the output as a URL
+    served locally, like Replicate's file delivery. Counts calls and the
+    highest number of predictions in flight at once.
+    """
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.calls = 0
+        self.versions = []
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self.predictions = StubPredictions(self)
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _OutputHandler)
+        self.server.outputs = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def run(self, model, input):
+        return self._upscale(input['image'])
+
+    def _upscale(self, image_file) -> str:
+        with self._lock:
+            self.calls += 1
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            time.sleep(self.latency)
+            img = Image.open(image_file)
+            buffer = io.BytesIO()
+            img.resize((img.width * 2, img.height * 2)).save(buffer, 'PNG')
+            with self._lock:
+                path = f"/output/{len(self.server.outputs)}.png"
+                self.server.outputs[path] = buffer.getvalue()
+            return f"http://127.0.0.1:{self.server.server_address[1]}{path}"
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _image_bytes(color, size=(200, 300)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+@contextmanager
+def _processor(concurrency: int = 4, cache_dir: str = None):
+    client = StubReplicate()
+    cache_dir = cache_dir or tempfile.mkdtemp(prefix='replicate_cache_')
+    processor = ImageProcessor({'image_processing': {
+        'upscale_using': 'replicate', 'cache_dir': cache_dir,
+        'replicate_concurrency': concurrency, 'dedupe_images': False}}, replicate_client=client)
+    try:
+        yield processor, client
+    finally:
+        client.close()
+
+
+def test_second_run_is_served_from_cache():
+    cache_dir = tempfile.mkdtemp(prefix='replicate_cache_')
+    try:
+        source = _image_bytes((200, 40, 40))
+        with _processor(cache_dir=cache_dir) as (processor, client):
+            first = processor._replicate_upscale_bytes(source)
+            assert client.calls == 1
+        # New processor and client: the result persists in the cache directory
+        with _processor(cache_dir=cache_dir) as (processor, client):
+            second = processor._replicate_upscale_bytes(source)
+            batch = processor.upscale_replicate_batch([source])
+            assert client.calls == 0
+            assert processor.upscale_metrics()['replicate_cache_hits'] == 2
+        assert first == second == batch[0]
+        assert Image.open(io.BytesIO(first)).size == (400, 600)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def test_identical_sources_are_submitted_once():
+    red, blue = _image_bytes((200, 40, 40)), _image_bytes((40, 40, 200))
+    with _processor() as (processor, client):
+        results = processor.upscale_replicate_batch([red, blue, red, red, blue])
+        assert client.calls == 2
+        assert results[0] == results[2] == results[3]
+        assert results[1] == results[4] and results[0] != results[1]
+        assert client.versions == [processor.replicate_model.split(':')[-1]] * 2
+        shutil.rmtree(processor.cache.cache_dir, ignore_errors=True)
+
+
+def test_in_flight_predictions_capped_at_concurrency():
+    sources = [_image_bytes((i * 20, 100, 100)) for i in range(10)]
+    with _processor(concurrency=3) as (processor, client):
+        client.latency = 0.2
+        results = processor.upscale_replicate_batch(sources)
+        assert client.calls == 10 and all(results)
+        assert client.max_in_flight == 3
+        shutil.rmtree(processor.cache.cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith('test_'):
+            check()
+            print(f"✅ {name}")
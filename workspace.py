@@ -0,0 +1,98 @@
+"""
+Temporary Workspace
+Per-cycle scratch directory for image artifacts, removed once the pin is posted
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+
+WORKSPACE_PREFIX = 'pin_cycle_'
+
+
+class Workspace:
+    """
+    Scratch directory for one automation cycle
+
+    Every file the image pipeline writes gets a collision-safe name inside the
+    directory (slug of the product title + random suffix) and is tracked, so
+    cleanup() removes all of it. Point `root` at a tmpfs such as /dev/shm to
+    keep intermediate images off the disk. Directories left behind by crashed
+    cycles are swept when a new workspace starts.
+    """
+
+    def __init__(self, root: str = None, stale_hours: float = 24):
+        self.root = root or tempfile.gettempdir()
+        os.makedirs(self.root, exist_ok=True)
+        sweep_stale_workspaces(self.root, stale_hours)
+
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.path = os.path.abspath(tempfile.mkdtemp(prefix=f"{WORKSPACE_PREFIX}{stamp}_", dir=self.root))
+        self.artifacts: List[str] = []
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'Workspace':
+        """Workspace configured by image_processing.workspace_dir / workspace_stale_hours"""
+        settings = config.get('image_processing', {})
+        return cls(settings.get('workspace_dir') or os.environ.get('PIN_WORKSPACE_DIR'),
+                   settings.get('workspace_stale_hours', 24))
+
+    def file_path(self, name_hint: str, suffix: str = '.jpg') -> str:
+        """New unique file path in the workspace, e.g. Cool-Lamp-2000_3f9c1a2b.jpg"""
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', name_hint or '').strip('-')[:40] or 'image'
+        path = os.path.join(self.path, f"{slug}_{uuid.uuid4().hex[:8]}{suffix}")
+        return self.track(path)
+
+    def track(self, path: Optional[str]) -> Optional[str]:
+        """
+        Record an artifact for cleanup (returns the path for chaining)
+        Paths outside the workspace belong to the caller and are not tracked
+        """
+        if not path or os.path.dirname(os.path.abspath(path)) != self.path:
+            return path
+        if path not in self.artifacts:
+            self.artifacts.append(path)
+        return path
+
+    def cleanup(self):
+        """Remove every tracked artifact and the workspace directory"""
+        for path in self.artifacts:
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                print(f"Error cleaning up file {path}: {e}")
+        self.artifacts = []
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self) -> 'Workspace':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
+
+
+def sweep_stale_workspaces(root: str, stale_hours: float = 24) -> int:
+    """Remove workspace directories under root older than stale_hours; returns how many"""
+    cutoff = time.time() - stale_hours * 3600
+    removed = 0
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return 0
+
+    for entry in entries:
+        try:
+            if (entry.name.startswith(WORKSPACE_PREFIX) and entry.is_dir(follow_symlinks=False)
+                    and entry.stat().st_mtime < cutoff):
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        except OSError:
+            continue
+    return removed